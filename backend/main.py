@@ -1,16 +1,33 @@
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, Response, StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import asyncio
-from models.maritime import Port, Route, GangSchedule, Vessel, KPIData, ForecastData, StrategicLever, SensitivityAnalysis
+import os
+import tempfile
+from models.maritime import Port, Route, GangSchedule, Vessel, KPIData, ForecastData, StrategicLever, SensitivityAnalysis, ScenarioParameters, PortUpdate
 from services.calculations import MaritimeCalculator
 from services.data_processor import DataProcessor
 from services.risk_analyzer import RiskAnalyzer
+from services.snapshot import SnapshotStore
+from services.scenarios import ScenarioEngine, RoutePortfolio
+from services.portfolio_risk import PortfolioRiskEngine
+from services.coalescing import SingleFlight
+from services.route_table import RouteAnalysisTable
+from services.gang_optimizer import GangScheduleOptimizer
+from services.berth_simulator import BerthSimulator
+from services.catalog import project
+from services.columnar import negotiate_columnar_format, encode_columns, ColumnarUnavailable
+from services.kpi_stream import KPIBroadcaster
+from services.dashboard import DashboardPipeline
+from services.calibration import RiskModelRegistry, RiskCalibrator
+from services.profiling import RequestProfiler, ProfilingMiddleware
+from services.ingest import ShipmentLog, ShipmentIngestor, NDJSON_MEDIA_TYPES, CSV_MEDIA_TYPES
+from services.admission import AdmissionController, AdmissionMiddleware, EndpointPolicy, INTERACTIVE, STANDARD, BATCH
 
 app = FastAPI(
     title="Ocean Treasury API",
@@ -18,6 +35,32 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control keeps large analysis batches from starving interactive
+# calls; added before CORS so rejections still carry CORS headers
+admission_controller = AdmissionController(
+    policies=[
+        EndpointPolicy("/health", INTERACTIVE, 0),
+        EndpointPolicy("/api/ports", INTERACTIVE, 0),
+        EndpointPolicy("/api/vessels", INTERACTIVE, 0),
+        EndpointPolicy("/api/admin/", INTERACTIVE, 0),
+        EndpointPolicy("/api/stream/", INTERACTIVE, 0),
+        EndpointPolicy("/api/shipments/ingest", STANDARD, 8, stream_body=True),
+        EndpointPolicy("/api/kpis/", STANDARD, 8),
+        EndpointPolicy("/api/dashboard", STANDARD, 4),
+        EndpointPolicy("/api/forecast/", STANDARD, 8),
+        EndpointPolicy("/api/routes/analyze", STANDARD, 4),
+        EndpointPolicy("/api/strategic/analyze", STANDARD, 4),
+        EndpointPolicy("/api/sensitivity/analyze", STANDARD, 4),
+        EndpointPolicy("/api/scenarios/evaluate", BATCH, 2),
+        EndpointPolicy("/api/portfolio/risk", BATCH, 1),
+        EndpointPolicy("/api/simulation/berths", BATCH, 1),
+        EndpointPolicy("/api/gangs/optimize", BATCH, 2)
+    ],
+    default_policy=EndpointPolicy("*", STANDARD, 4),
+    max_cost_in_flight=int(os.environ.get("OCEAN_TREASURY_MAX_COST_IN_FLIGHT", "20000"))
+)
+app.add_middleware(AdmissionMiddleware, controller=admission_controller)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -27,10 +70,84 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in per-request sampling profiler: send "X-Profile: 1" or set a sample rate
+request_profiler = RequestProfiler(
+    sample_rate=float(os.environ.get("OCEAN_TREASURY_PROFILE_SAMPLE_RATE", "0"))
+)
+app.add_middleware(ProfilingMiddleware, profiler=request_profiler)
+
 # Initialize services
+# Reference data lives in a shared memory-mapped snapshot so that every
+# uvicorn worker attaches to the same pages instead of holding its own copy
+snapshot_store = SnapshotStore(os.environ.get(
+    "OCEAN_TREASURY_SNAPSHOT_DIR",
+    os.path.join(tempfile.gettempdir(), "ocean-treasury-snapshots")
+))
+# Ingested shipments are appended to a log next to the snapshots and read
+# back by every worker
+shipment_log = ShipmentLog(os.path.join(snapshot_store.directory, "shipments.csv"))
 calculator = MaritimeCalculator()
-data_processor = DataProcessor()
+data_processor = DataProcessor(snapshot_store, shipment_log)
 risk_analyzer = RiskAnalyzer()
+scenario_engine = ScenarioEngine(calculator, risk_analyzer)
+portfolio_risk_engine = PortfolioRiskEngine()
+request_coalescer = SingleFlight()
+# Edits to the route table are shared by all workers through a versioned
+# file next to the snapshots
+route_table = RouteAnalysisTable(
+    calculator, risk_analyzer, os.path.join(snapshot_store.directory, "routes", "route-table.json")
+)
+berth_simulator = BerthSimulator()
+# Dashboard panels share one pipeline so the fused endpoint loads data once
+dashboard_pipeline = DashboardPipeline(calculator, risk_analyzer, data_processor)
+# Dashboards subscribe to pushed KPI changes instead of polling
+kpi_broadcaster = KPIBroadcaster(
+    compute=lambda: _compute_kpis(KPICalculationRequest()),
+    data_version=data_processor.get_data_version
+)
+shipment_ingestor = ShipmentIngestor(shipment_log, on_commit=kpi_broadcaster.notify)
+# Risk weights are refit to realized costs in the background; versions are
+# shared by all workers next to the data snapshots
+risk_calibrator = RiskCalibrator(
+    risk_analyzer,
+    RiskModelRegistry(os.path.join(snapshot_store.directory, "risk-models")),
+    load_training_data=lambda: data_processor.get_risk_training_data({
+        # Realized costs include operational risk, known for tabled routes
+        route.id: risk_analyzer.calculate_operational_risk(route) for route in route_table.current_routes()
+    }),
+    on_change=route_table.recompute_all
+)
+
+MAX_SIMULATION_REPLICATIONS = 100000
+MAX_PAGE_SIZE = 1000
+MAX_PORTFOLIO_SCENARIOS = 1000000
+MAX_GANG_WINDOW_DAYS = 366
+MAX_GANGS_PER_VESSEL = 50
+SSE_KEEPALIVE_SECONDS = 15.0
+
+KPI_TIMEOUT_SECONDS = 30.0
+FORECAST_TIMEOUT_SECONDS = 30.0
+DASHBOARD_TIMEOUT_SECONDS = 30.0
+
+@app.on_event("startup")
+async def attach_data_snapshot():
+    # Only the first worker to start publishes, and only when the shared
+    # snapshot holds other data; the others attach to it
+    data_processor.publish_reference_snapshot()
+
+@app.on_event("startup")
+async def start_kpi_broadcaster():
+    kpi_broadcaster.start()
+
+@app.on_event("startup")
+async def start_risk_calibration():
+    risk_calibrator.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    await kpi_broadcaster.stop()
+    await risk_calibrator.stop()
+    berth_simulator.shutdown()
 
 # Request/Response Models
 class RouteAnalysisRequest(BaseModel):
@@ -39,13 +156,59 @@ class RouteAnalysisRequest(BaseModel):
     gang_schedules: List[GangSchedule]
 
 class KPICalculationRequest(BaseModel):
-    time_period: str = "quarterly"
+    time_period: str = "quarterly"  # Rollup grain: monthly, quarterly or yearly
     include_forecast: bool = True
+    period: Optional[str] = None    # e.g. "2024-03", "2024Q1" or "2024"; all periods when omitted
+    port_id: Optional[str] = None
+    route_id: Optional[str] = None
 
 class StrategicAnalysisRequest(BaseModel):
     ports: List[Port]
     budget_constraint: Optional[float] = None
 
+class DashboardRequest(BaseModel):
+    time_period: str = "quarterly"
+    period: Optional[str] = None
+    port_id: Optional[str] = None
+    route_id: Optional[str] = None
+    ports: Optional[List[Port]] = None  # defaults to the port catalog
+    budget_constraint: Optional[float] = None
+
+class GangPlanRequest(BaseModel):
+    vessels: List[Vessel]
+    gang_schedules: List[GangSchedule]
+    start_date: Optional[str] = None  # ISO date, defaults to today
+    window_days: int = Field(7, ge=1, le=MAX_GANG_WINDOW_DAYS)
+    holidays: List[str] = []
+    arrival_days: Dict[str, int] = {}   # vessel id -> day offset of arrival
+    deadline_days: Dict[str, int] = {}  # vessel id -> day offset discharge must finish by
+    tons_per_gang_shift: Optional[float] = Field(None, gt=0)
+    max_gangs_per_vessel: Optional[int] = Field(None, ge=1, le=MAX_GANGS_PER_VESSEL)
+
+class BerthSimulationRequest(BaseModel):
+    ports: Optional[List[Port]] = None      # defaults to the port catalog
+    vessels: Optional[List[Vessel]] = None  # arriving vessel mix, defaults to the fleet
+    routes: Optional[List[Route]] = None    # disruption probabilities, defaults to the route table
+    gang_schedules: List[GangSchedule] = []  # gang-driven discharge, else each vessel's discharge days
+    replications: int = 1000
+    horizon_days: float = Field(30, gt=0)
+    arrival_growth: float = Field(1.0, ge=0)  # e.g. 1.3 for 30% more arrivals
+    default_arrivals_per_day: float = Field(0.3, ge=0)
+    arrivals_per_day: Dict[str, float] = {}  # port id -> base arrival rate
+    disruption_probability: Dict[str, float] = {}  # port id -> override of the route average
+    berths: Dict[str, int] = {}
+    seed: Optional[int] = None
+
+class ScenarioAnalysisRequest(BaseModel):
+    routes: List[Route]
+    scenarios: List[ScenarioParameters]
+
+class PortfolioRiskRequest(BaseModel):
+    routes: List[Route]
+    scenarios: int = 10000
+    confidence: float = 0.95
+    seed: Optional[int] = None
+
 # API Endpoints
 
 @app.get("/")
@@ -57,186 +220,618 @@ async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
 @app.post("/api/routes/analyze")
-async def analyze_routes(request: RouteAnalysisRequest):
+async def analyze_routes(request: RouteAnalysisRequest, accept: Optional[str] = Header(default=None)):
     """
     Analyze routes for cost optimization and risk assessment
     """
     try:
-        analysis_results = []
-        
-        for route in request.routes:
-            # Calculate base costs
-            base_cost = calculator.calculate_base_cost(route)
-            
-            # Calculate risk costs
-            risk_cost = risk_analyzer.calculate_risk_cost(route)
-            
-            # Calculate P95 cost
-            p95_cost = calculator.calculate_p95_cost(route, risk_cost)
-            
-            # Determine recommendation
-            recommendation = risk_analyzer.get_route_recommendation(route, risk_cost)
-            
-            # Calculate savings
-            savings = calculator.calculate_potential_savings(route, base_cost, p95_cost)
-            
-            route_analysis = {
-                "id": route.id,
-                "name": route.name,
-                "base_cost": base_cost,
-                "risk_cost": risk_cost,
-                "p95_cost": p95_cost,
-                "expected_margin": route.expected_margin,
-                "disruption_probability": route.disruption_probability,
-                "recommendation": recommendation,
-                "savings": savings,
-                "estimated_days": route.estimated_days
-            }
-            
-            analysis_results.append(route_analysis)
+        # Columnar clients get the same analysis without per-row dicts
+        media_type = negotiate_columnar_format(accept)
+        if media_type:
+            return _columnar_response(route_table.analyze_columns(request.routes), media_type)
+        
+        analysis_results = route_table.analyze_routes(request.routes)
         
         return {"routes": analysis_results}
     
+    except ColumnarUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/kpis/calculate")
-async def calculate_kpis(request: KPICalculationRequest):
+def _columnar_response(columns: Dict[str, Any], media_type: str) -> Response:
+    return Response(content=encode_columns(columns, media_type), media_type=media_type)
+
+@app.get("/api/routes/table")
+async def get_route_table():
     """
-    Calculate key performance indicators
+    Get the materialized route analysis table
+    """
+    rows = route_table.get_rows()
+    return {"version": route_table.version, "routes": rows}
+
+@app.put("/api/routes/table")
+async def upsert_route_table(routes: List[Route]):
+    """
+    Add or replace routes in the materialized table and return the change set
     """
     try:
-        # Get historical data
-        historical_data = await data_processor.get_historical_data(request.time_period)
-        
-        # Calculate KPIs
-        total_expected_margin = calculator.calculate_total_expected_margin(historical_data)
-        disruption_probability = risk_analyzer.calculate_avg_disruption_probability(historical_data)
-        cost_of_uncertainty = calculator.calculate_cost_of_uncertainty(historical_data)
-        top_ports_by_risk = risk_analyzer.get_top_risk_ports(historical_data)
+        return route_table.upsert_routes(routes)
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/routes/table/{route_id}")
+async def delete_route_table_entry(route_id: str):
+    """
+    Remove a route from the materialized table
+    """
+    change_set = route_table.remove_routes([route_id])
+    if not change_set["removed"]:
+        raise HTTPException(status_code=404, detail=f"Route {route_id} not found")
+    
+    return change_set
+
+@app.patch("/api/routes/table/ports/{port_id}")
+async def update_route_table_port(port_id: str, update: PortUpdate):
+    """
+    Update a port and recompute only the routes that depend on it
+    """
+    try:
+        return route_table.update_port(port_id, update)
+    
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/scenarios/evaluate")
+async def evaluate_scenarios(request: ScenarioAnalysisRequest):
+    """
+    Evaluate what-if model parameter sets against a route portfolio
+    """
+    try:
+        portfolio = RoutePortfolio(request.routes)
+        evaluation = scenario_engine.evaluate(portfolio, request.scenarios)
         
-        # Generate trendline data
-        trendline_data = data_processor.generate_trendline_data(historical_data)
+        return {
+            "route_ids": evaluation["route_ids"],
+            "baseline": {
+                "parameters": evaluation["baseline"]["parameters"],
+                "totals": evaluation["baseline"]["totals"].model_dump()
+            },
+            "scenarios": [result.model_dump() for result in evaluation["scenarios"]]
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/portfolio/risk")
+async def analyze_portfolio_risk(request: PortfolioRiskRequest):
+    """
+    Portfolio VaR and CVaR of the route book under correlated disruptions,
+    with each route's contribution to CVaR
+    """
+    try:
+        if not request.routes:
+            raise ValueError("At least one route is required")
+        if not 1 <= request.scenarios <= MAX_PORTFOLIO_SCENARIOS:
+            raise ValueError(f"scenarios must be between 1 and {MAX_PORTFOLIO_SCENARIOS}")
         
-        kpi_data = KPIData(
-            total_expected_margin=total_expected_margin,
-            disruption_probability=disruption_probability,
-            cost_of_uncertainty=cost_of_uncertainty,
-            top_ports_by_risk=top_ports_by_risk,
-            trendline_data=trendline_data
+        # Risk costs are read on the event loop; only the simulation leaves it
+        portfolio = RoutePortfolio(request.routes)
+        loss_given_disruption = scenario_engine.analyze(portfolio)["risk_cost"]
+        history = await data_processor.get_history_columns()
+        result = await asyncio.to_thread(
+            portfolio_risk_engine.simulate, portfolio, loss_given_disruption, history,
+            request.scenarios, request.confidence, request.seed
         )
         
-        return kpi_data.model_dump()
+        return result.model_dump()
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/forecast/generate")
-async def generate_forecast(request: KPICalculationRequest):
+@app.post("/api/gangs/optimize")
+async def optimize_gang_schedules(request: GangPlanRequest):
     """
-    Generate cost exposure forecast
+    Plan gangs per shift for every vessel in a port call window
     """
     try:
-        # Get baseline data
-        baseline_data = await data_processor.get_baseline_data()
+        optimizer = GangScheduleOptimizer(calculator)
+        if request.tons_per_gang_shift:
+            optimizer.tons_per_gang_shift = request.tons_per_gang_shift
+        if request.max_gangs_per_vessel:
+            optimizer.max_gangs_per_vessel = request.max_gangs_per_vessel
+        
+        start_date = datetime.fromisoformat(request.start_date).date() if request.start_date else datetime.now().date()
+        slots = optimizer.build_slots(request.gang_schedules, start_date, request.window_days, request.holidays)
+        plans = optimizer.plan_berth_lineup(request.vessels, slots, request.arrival_days, request.deadline_days)
         
-        # Calculate baseline cost
-        baseline_cost = calculator.calculate_baseline_cost(baseline_data)
+        return {
+            "plans": [plan.model_dump() for plan in plans],
+            "total_cost": round(sum(plan.total_cost for plan in plans if plan.feasible), 2),
+            "infeasible_vessels": [plan.vessel_id for plan in plans if not plan.feasible]
+        }
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/simulation/berths")
+async def simulate_berths(request: BerthSimulationRequest):
+    """
+    Simulate arrivals, berth queuing and discharge to get distributions of
+    turnaround time, demurrage and cost per port
+    """
+    if not 1 <= request.replications <= MAX_SIMULATION_REPLICATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"replications must be between 1 and {MAX_SIMULATION_REPLICATIONS}"
+        )
+    
+    try:
+        ports = request.ports or await data_processor.get_all_ports()
+        vessels = request.vessels or await data_processor.get_all_vessels()
+        if not vessels:
+            raise HTTPException(status_code=400, detail="At least one vessel is required")
         
-        # Calculate potential savings scenarios
-        potential_savings = calculator.calculate_potential_savings_scenarios(baseline_data)
+        routes = request.routes if request.routes is not None else route_table.current_routes()
+        route_disruption = berth_simulator.port_disruption_probabilities(routes)
+        discharge_capacity = (
+            GangScheduleOptimizer(calculator).discharge_capacity(request.gang_schedules)
+            if request.gang_schedules else None
+        )
+        configs = [
+            berth_simulator.build_config(
+                port,
+                vessels,
+                arrivals_per_day=request.arrivals_per_day.get(port.id, request.default_arrivals_per_day),
+                horizon_days=request.horizon_days,
+                arrival_growth=request.arrival_growth,
+                disruption_probability=request.disruption_probability.get(
+                    port.id, route_disruption.get(port.id)
+                ),
+                berths=request.berths.get(port.id),
+                discharge_capacity=discharge_capacity
+            )
+            for port in ports
+        ]
+        results = await berth_simulator.simulate(ports, configs, request.replications, request.seed)
         
-        # Generate cost distribution
-        cost_distribution = risk_analyzer.generate_cost_distribution(baseline_data)
+        return {"ports": [result.model_dump() for result in results]}
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/shipments/ingest")
+async def ingest_shipments(request: Request):
+    """
+    Append shipment records streamed as NDJSON or CSV.
+    
+    Records are validated in micro-batches; invalid ones are reported and
+    skipped. The response lists the byte ranges of the shipment log that
+    were durably committed, also when a batch with missing fields stops
+    the stream with a 400.
+    """
+    try:
+        media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if media_type not in NDJSON_MEDIA_TYPES + CSV_MEDIA_TYPES:
+            raise HTTPException(status_code=415, detail="Send shipments as application/x-ndjson or text/csv")
         
-        forecast_data = ForecastData(
-            baseline_cost=baseline_cost,
-            potential_savings=potential_savings,
-            cost_distribution=cost_distribution
+        result = await shipment_ingestor.ingest_stream(request.stream(), media_type)
+        if "detail" in result:
+            return JSONResponse(status_code=400, content=result)
+        return result
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/kpis/calculate")
+async def calculate_kpis(request: KPICalculationRequest):
+    """
+    Calculate key performance indicators
+    """
+    try:
+        # Identical concurrent requests share one computation
+        key = SingleFlight.make_key("kpis", {
+            "time_period": request.time_period.strip().lower(),
+            "period": request.period,
+            "port_id": request.port_id,
+            "route_id": request.route_id
+        })
+        return await request_coalescer.run(key, lambda: _compute_kpis(request), timeout=KPI_TIMEOUT_SECONDS)
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="KPI calculation timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _compute_kpis(request: KPICalculationRequest) -> Dict[str, Any]:
+    cube = await data_processor.get_rollup_cube()
+    return dashboard_pipeline.compute_kpis(
+        cube, risk_analyzer, request.time_period,
+        period=request.period, port_id=request.port_id, route_id=request.route_id
+    )
+
+@app.get("/api/stream/kpis")
+async def stream_kpis(request: Request):
+    """
+    Server-sent events with KPI, trendline and top-risk-port changes.
+    
+    The first event is a full snapshot; later events are deltas sent only
+    when the underlying data changes.
+    """
+    subscriber = await kpi_broadcaster.subscribe()
+    
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield event
+        finally:
+            kpi_broadcaster.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/kpis/rollup")
+async def get_kpi_rollup(request: KPICalculationRequest):
+    """
+    Get KPIs for every period of the requested grain within the slice
+    """
+    try:
+        cube = await data_processor.get_rollup_cube()
+        period_totals = cube.group_by(
+            request.time_period, "period",
+            period=request.period, port_id=request.port_id, route_id=request.route_id
         )
         
-        return forecast_data.model_dump()
+        return {
+            "time_period": request.time_period,
+            "periods": [
+                {
+                    "period": period,
+                    "shipments": totals.count("total_cost"),
+                    "tonnage": totals.sum("tonnage"),
+                    "total_expected_margin": calculator.calculate_total_expected_margin_from_rollup(totals),
+                    "disruption_probability": risk_analyzer.calculate_avg_disruption_probability_from_rollup(totals),
+                    "cost_of_uncertainty": calculator.calculate_cost_of_uncertainty_from_rollup(totals)
+                }
+                for period, totals in period_totals.items()
+            ]
+        }
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/kpis/trendline")
+async def get_kpi_trendline(request: KPICalculationRequest, accept: Optional[str] = Header(default=None)):
+    """
+    Get expected vs. realized cost trendline data
+    """
+    try:
+        media_type = negotiate_columnar_format(accept)
+        if media_type:
+            history_columns = await data_processor.get_history_columns()
+            return _columnar_response(data_processor.generate_trendline_columns(history_columns), media_type)
+        
+        historical_data = await data_processor.get_historical_data(request.time_period)
+        trendline_data = data_processor.generate_trendline_data(historical_data)
+        
+        return {"trendline_data": [point.model_dump() for point in trendline_data]}
     
+    except ColumnarUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/forecast/generate")
+async def generate_forecast(request: KPICalculationRequest):
+    """
+    Generate cost exposure forecast
+    """
+    try:
+        # The forecast does not depend on the request fields, so every
+        # concurrent request coalesces onto the same key
+        key = SingleFlight.make_key("forecast", {})
+        return await request_coalescer.run(key, _compute_forecast, timeout=FORECAST_TIMEOUT_SECONDS)
+    
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Forecast generation timed out")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _compute_forecast() -> Dict[str, Any]:
+    baseline_data = await data_processor.get_baseline_data()
+    return dashboard_pipeline.compute_forecast(baseline_data, risk_analyzer)
+
 @app.post("/api/strategic/analyze")
 async def analyze_strategic_levers(request: StrategicAnalysisRequest):
     """
     Analyze strategic optimization levers
     """
     try:
-        strategic_levers = []
-        
-        for port in request.ports:
-            # Analyze relationship investment opportunities
-            relationship_lever = risk_analyzer.analyze_relationship_investment(port)
-            if relationship_lever:
-                strategic_levers.append(relationship_lever)
-            
-            # Analyze volume consolidation opportunities
-            consolidation_lever = risk_analyzer.analyze_volume_consolidation(port)
-            if consolidation_lever:
-                strategic_levers.append(consolidation_lever)
-            
-            # Analyze oversight opportunities
-            oversight_lever = risk_analyzer.analyze_oversight_investment(port)
-            if oversight_lever:
-                strategic_levers.append(oversight_lever)
-        
-        # Filter by budget constraint if provided
-        if request.budget_constraint:
-            strategic_levers = [
-                lever for lever in strategic_levers 
-                if lever.investment_required <= request.budget_constraint
-            ]
-        
-        # Sort by ROI
-        strategic_levers.sort(key=lambda x: x.roi, reverse=True)
-        
-        return {"strategic_levers": [lever.model_dump() for lever in strategic_levers]}
+        strategic_levers = dashboard_pipeline.compute_strategic_levers(
+            request.ports, request.budget_constraint, risk_analyzer
+        )
+        return {"strategic_levers": strategic_levers}
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/sensitivity/analyze")
-async def analyze_sensitivity(ports: List[Port]):
+async def analyze_sensitivity(ports: List[Port], accept: Optional[str] = Header(default=None)):
     """
     Perform sensitivity analysis for corruption thresholds
     """
     try:
-        sensitivity_results = []
-        
-        for port in ports:
-            analysis = risk_analyzer.analyze_corruption_sensitivity(port)
-            sensitivity_results.append(analysis.dict())
+        media_type = negotiate_columnar_format(accept)
+        if media_type:
+            return _columnar_response(risk_analyzer.analyze_corruption_sensitivity_columns(ports), media_type)
         
-        return {"sensitivity_analysis": sensitivity_results}
+        return {"sensitivity_analysis": dashboard_pipeline.compute_sensitivity(ports, risk_analyzer)}
     
+    except ColumnarUnavailable as e:
+        raise HTTPException(status_code=406, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/dashboard")
+async def get_dashboard(request: DashboardRequest):
+    """
+    KPIs, forecast, strategic levers and sensitivity in one response,
+    computed from a single load of the data
+    """
+    try:
+        key = SingleFlight.make_key("dashboard", request.model_dump())
+        return await request_coalescer.run(
+            key,
+            lambda: dashboard_pipeline.run(
+                request.time_period, request.period, request.port_id, request.route_id,
+                request.ports, request.budget_constraint
+            ),
+            timeout=DASHBOARD_TIMEOUT_SECONDS
+        )
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Dashboard calculation timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/ports")
-async def get_ports():
+async def get_ports(
+    region: Optional[str] = None,
+    country: Optional[str] = None,
+    reliability: Optional[str] = None,  # 'low', 'medium', 'high' or 'unknown'
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
     """
-    Get list of available ports
+    Get ports, optionally filtered, paginated and projected
     """
     try:
-        ports = await data_processor.get_all_ports()
-        return {"ports": [port.model_dump() for port in ports]}
+        field_list = _parse_fields(fields, Port)
+        _validate_limit(limit)
+        
+        ports, next_cursor, total = await data_processor.query_ports(
+            region=region, country=country, reliability=reliability, cursor=cursor, limit=limit
+        )
+        return {
+            "ports": [project(port.model_dump(), field_list) for port in ports],
+            "total": total,
+            "next_cursor": next_cursor
+        }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/vessels")
-async def get_vessels():
+async def get_vessels(
+    min_tonnage: Optional[float] = None,
+    max_tonnage: Optional[float] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get vessels, optionally filtered by tonnage, paginated and projected
+    """
+    try:
+        field_list = _parse_fields(fields, Vessel)
+        _validate_limit(limit)
+        
+        vessels, next_cursor, total = await data_processor.query_vessels(
+            min_tonnage=min_tonnage, max_tonnage=max_tonnage, cursor=cursor, limit=limit
+        )
+        return {
+            "vessels": [project(vessel.model_dump(), field_list) for vessel in vessels],
+            "total": total,
+            "next_cursor": next_cursor
+        }
+    
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_fields(fields: Optional[str], model) -> Optional[List[str]]:
+    if not fields:
+        return None
+    
+    field_list = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in field_list if field not in model.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return field_list
+
+def _validate_limit(limit: Optional[int]):
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+@app.get("/api/admin/snapshot")
+async def get_snapshot_info():
     """
-    Get list of vessels
+    Get the version of the shared data snapshot this worker is attached to
     """
     try:
-        vessels = await data_processor.get_all_vessels()
-        return {"vessels": [vessel.model_dump() for vessel in vessels]}
+        snapshot = data_processor.get_snapshot()
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="No data snapshot published")
+        
+        return {
+            "version": snapshot.version,
+            "created_at": snapshot.created_at,
+            "size_bytes": snapshot.size_bytes,
+            "rows": {table: snapshot.row_count(table) for table in snapshot.tables},
+            "worker_pid": os.getpid()
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/admin/snapshot/publish")
+async def publish_snapshot():
+    """
+    Republish the reference data as a new snapshot version, which every
+    worker attaches to on its next read
+    """
+    try:
+        version = await asyncio.to_thread(data_processor.publish_reference_snapshot, True)
+        if version is None:
+            raise HTTPException(status_code=404, detail="No snapshot store configured")
+        return {"version": version}
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/admin/stream")
+async def get_stream_stats():
+    """
+    Get subscriber and backpressure counters for the KPI stream
+    """
+    return kpi_broadcaster.get_stats()
+
+@app.get("/api/admin/coalescing")
+async def get_coalescing_stats():
+    """
+    Get counters for coalesced KPI and forecast requests
+    """
+    return request_coalescer.get_stats()
+
+@app.get("/api/admin/ingest")
+async def get_ingest_stats():
+    """
+    Get group commit counters and the durable offset of the shipment log
+    """
+    return shipment_ingestor.get_stats()
+
+@app.get("/api/admin/admission")
+async def get_admission_stats():
+    """
+    Get in-flight cost, queue depths and rejection counters
+    """
+    return admission_controller.get_stats()
+
+@app.get("/api/admin/profiles")
+async def list_profiles():
+    """
+    List stored request profiles, newest first
+    """
+    return {"profiles": request_profiler.list_profiles(), "capacity": request_profiler.capacity}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """
+    Get one request profile as collapsed stacks for flamegraph tools
+    """
+    profile = request_profiler.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found or already evicted")
+    if profile.too_short_to_sample:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Request took {profile.duration_ms} ms, too short to sample at a "
+                   f"{profile.interval * 1000:g} ms interval"
+        )
     
+    return PlainTextResponse(profile.collapsed())
+
+@app.get("/api/admin/risk-model")
+async def get_risk_model():
+    """
+    Get the active risk model, stored versions and the last calibration run
+    """
+    try:
+        return risk_calibrator.get_status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/admin/risk-model/calibrate")
+async def calibrate_risk_model():
+    """
+    Refit the risk model to shipment history now
+    """
+    try:
+        return await risk_calibrator.calibrate()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/admin/risk-model/{version}/activate")
+async def activate_risk_model(version: int, pin: bool = False):
+    """
+    Roll back or forward to a stored risk model version, optionally pinning
+    it so scheduled calibrations do not replace it
+    """
+    try:
+        risk_calibrator.activate(version, pinned=pin)
+        return risk_calibrator.registry.get_active()
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/admin/risk-model/unpin")
+async def unpin_risk_model():
+    """
+    Let scheduled calibrations replace the active version again
+    """
+    try:
+        risk_calibrator.unpin()
+        return risk_calibrator.registry.get_active()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -16,6 +16,14 @@ class Port(BaseModel):
     reliability_score: Optional[float] = None
     average_delay_days: Optional[float] = None
 
+class PortUpdate(BaseModel):
+    name: Optional[str] = None
+    country: Optional[str] = None
+    region: Optional[str] = None
+    corruption_index: Optional[float] = None
+    reliability_score: Optional[float] = None
+    average_delay_days: Optional[float] = None
+
 class Route(BaseModel):
     id: str
     name: str
@@ -38,6 +46,10 @@ class GangSchedule(BaseModel):
     cost_per_gang: float
     total_cost: float
 
+class GangAssignment(GangSchedule):
+    day: int  # offset from the start of the port call window
+    vessel_id: str
+
 class Vessel(BaseModel):
     id: str
     name: str
@@ -49,6 +61,18 @@ class Vessel(BaseModel):
     under_holding: float
     grand_total: float
 
+class VesselDischargePlan(BaseModel):
+    vessel_id: str
+    feasible: bool
+    gang_shifts_required: int
+    labour_cost: float
+    holding_cost: float
+    total_cost: float
+    completion_day: Optional[int] = None
+    completion_shift: Optional[str] = None
+    gang_costs: Dict[str, float]
+    assignments: List[GangAssignment]
+
 class TrendlineDataPoint(BaseModel):
     date: str
     expected: float
@@ -91,3 +115,70 @@ class SensitivityAnalysis(BaseModel):
     is_economical: bool
     break_even_point: float
 
+class ScenarioParameters(BaseModel):
+    # Overrides of the live model parameters; anything left unset keeps
+    # the value currently used by the calculator and risk analyzer
+    name: Optional[str] = None
+    distance_cost_per_nm: Optional[float] = None
+    uncertainty_buffer_rate: Optional[float] = None
+    current_cost_uplift: Optional[float] = None
+    corruption_risk_weight: Optional[float] = None
+    weather_risk_weight: Optional[float] = None
+    operational_risk_weight: Optional[float] = None
+    base_risk_cost: Optional[float] = None
+    risk_threshold_medium: Optional[float] = None
+    risk_threshold_high: Optional[float] = None
+    weather_risk_multipliers: Optional[Dict[str, float]] = None
+
+class ScenarioTotals(BaseModel):
+    base_cost: float
+    risk_cost: float
+    p95_cost: float
+    savings: float
+    routes_use: int
+    routes_caution: int
+    routes_avoid: int
+
+class ScenarioResult(BaseModel):
+    name: str
+    totals: ScenarioTotals
+    total_deltas: Dict[str, float]
+    route_deltas: Dict[str, List[float]]  # metric -> per-route delta vs baseline
+    recommendation_changes: Dict[str, str]  # route id -> new recommendation
+
+class DistributionSummary(BaseModel):
+    mean: float
+    p50: float
+    p90: float
+    p95: float
+    p99: float
+
+class PortSimulationResult(BaseModel):
+    port: Port
+    replications: int
+    vessels_per_replication: float
+    berth_utilization: float
+    waiting_days: DistributionSummary
+    turnaround_days: DistributionSummary
+    demurrage: DistributionSummary  # per vessel
+    cost_per_replication: DistributionSummary  # labour + demurrage over the horizon
+
+class RouteRiskContribution(BaseModel):
+    route_id: str
+    route_name: str
+    disruption_probability: float
+    loss_given_disruption: float
+    expected_loss: float
+    cvar_contribution: float  # Euler allocation; contributions sum to the portfolio CVaR
+    contribution_share: float
+
+class PortfolioRiskResult(BaseModel):
+    scenarios: int
+    confidence: float
+    expected_loss: float
+    value_at_risk: float
+    conditional_value_at_risk: float
+    standalone_cvar_sum: float  # CVaR if every route were assessed on its own
+    estimated_port_pairs: int   # Same-region port correlations estimated from history rather than defaulted
+    estimated_region_pairs: int  # Region factor correlations estimated from history
+    contributions: List[RouteRiskContribution]
@@ -0,0 +1,243 @@
+import asyncio
+import itertools
+import json
+import math
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+# Priority classes, most urgent first. Interactive calls are never queued.
+INTERACTIVE = 0
+STANDARD = 1
+BATCH = 2
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', STANDARD: 'standard', BATCH: 'batch'}
+
+class EndpointPolicy:
+    """
+    Priority class and concurrency limit for requests under a path prefix.
+    Streaming endpoints are admitted at unit cost without buffering the body.
+    """
+    
+    def __init__(self, prefix: str, priority: int, max_concurrent: int, stream_body: bool = False):
+        self.prefix = prefix
+        self.priority = priority
+        self.max_concurrent = max_concurrent
+        self.stream_body = stream_body
+        self.in_flight = 0
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+class _Waiter:
+    def __init__(self, policy: EndpointPolicy, cost: int, sequence: int):
+        self.policy = policy
+        self.cost = cost
+        self.sequence = sequence
+        self.future = asyncio.get_running_loop().create_future()
+
+class AdmissionController:
+    """
+    Admits expensive requests against per-endpoint concurrency limits and a
+    shared budget of in-flight cost.
+    
+    A request's cost grows with the number of routes, ports and vessels in
+    its payload. Requests that do not fit wait in priority order; when the
+    queue for their class is full they get 429, and when they wait too long
+    they get 503, both with a Retry-After estimated from recent throughput.
+    """
+    
+    def __init__(self, policies: List[EndpointPolicy], default_policy: EndpointPolicy,
+                 max_cost_in_flight: int = 20000):
+        self.policies = policies
+        self.default_policy = default_policy
+        self.max_cost_in_flight = max_cost_in_flight
+        self.max_queued = {STANDARD: 64, BATCH: 16}
+        self.max_wait_seconds = {STANDARD: 5.0, BATCH: 30.0}
+        self.max_body_bytes = 64 * 1024 * 1024
+        self.cost_in_flight = 0
+        self.seconds_per_cost = 0.001  # Running estimate of service time per cost unit
+        self.waiters: List[_Waiter] = []
+        self.counters = {'admitted': 0, 'queued': 0, 'rejected_429': 0, 'rejected_503': 0, 'bypassed': 0}
+        self._sequence = itertools.count()
+    
+    def policy_for(self, method: str, path: str) -> Optional[EndpointPolicy]:
+        """
+        Get the policy for a request, or None when it bypasses admission
+        """
+        if method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        for policy in self.policies:
+            if path.startswith(policy.prefix):
+                return None if policy.priority == INTERACTIVE else policy
+        return self.default_policy
+    
+    def estimate_cost(self, body: bytes) -> int:
+        """
+        Cost units of a JSON payload: one per entity id it carries, so routes
+        (with their two ports), ports and vessels are weighed without parsing
+        the body twice
+        """
+        return 1 + body.count(b'"id"')
+    
+    async def acquire(self, policy: EndpointPolicy, cost: int):
+        """
+        Wait for capacity or raise AdmissionRejected
+        """
+        if not self.waiters and self._fits(policy, cost):
+            self._admit(policy, cost)
+            return
+        
+        queued = sum(1 for waiter in self.waiters if waiter.policy.priority == policy.priority)
+        if queued >= self.max_queued[policy.priority]:
+            self.counters['rejected_429'] += 1
+            raise AdmissionRejected(429, "Too many queued requests", self.retry_after())
+        
+        waiter = _Waiter(policy, cost, next(self._sequence))
+        self.waiters.append(waiter)
+        self.waiters.sort(key=lambda entry: (entry.policy.priority, entry.sequence))
+        self.counters['queued'] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait([waiter.future], timeout=self.max_wait_seconds[policy.priority])
+        except BaseException:
+            # Client went away; give back capacity admitted in the meantime
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._return(policy, cost)
+            raise
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                self.waiters.remove(waiter)
+                # The waiter may have been holding back smaller requests
+                self._dispatch()
+        
+        if waiter.future.cancelled():
+            self.counters['rejected_503'] += 1
+            raise AdmissionRejected(503, "Server is overloaded", self.retry_after())
+    
+    def release(self, policy: EndpointPolicy, cost: int, elapsed: float):
+        self.seconds_per_cost = 0.9 * self.seconds_per_cost + 0.1 * (elapsed / cost)
+        self._return(policy, cost)
+    
+    def retry_after(self) -> int:
+        backlog = self.cost_in_flight + sum(waiter.cost for waiter in self.waiters)
+        return min(max(int(math.ceil(backlog * self.seconds_per_cost)), 1), 60)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.counters,
+            'cost_in_flight': self.cost_in_flight,
+            'max_cost_in_flight': self.max_cost_in_flight,
+            'waiting': {
+                PRIORITY_NAMES[priority]: sum(1 for waiter in self.waiters if waiter.policy.priority == priority)
+                for priority in (STANDARD, BATCH)
+            },
+            'endpoints': {
+                policy.prefix: {
+                    'priority': PRIORITY_NAMES[policy.priority],
+                    'in_flight': policy.in_flight,
+                    'max_concurrent': policy.max_concurrent
+                }
+                for policy in self.policies + [self.default_policy]
+                if policy.priority != INTERACTIVE
+            }
+        }
+    
+    def _fits(self, policy: EndpointPolicy, cost: int) -> bool:
+        if policy.in_flight >= policy.max_concurrent:
+            return False
+        # An oversized request still runs once nothing else is in flight
+        return self.cost_in_flight + cost <= self.max_cost_in_flight or self.cost_in_flight == 0
+    
+    def _admit(self, policy: EndpointPolicy, cost: int):
+        policy.in_flight += 1
+        self.cost_in_flight += cost
+        self.counters['admitted'] += 1
+    
+    def _return(self, policy: EndpointPolicy, cost: int):
+        policy.in_flight -= 1
+        self.cost_in_flight -= cost
+        self._dispatch()
+    
+    def _dispatch(self):
+        # Waiters blocked only by their endpoint limit are skipped, but one
+        # blocked by the cost budget holds back everything behind it
+        for waiter in list(self.waiters):
+            if waiter.policy.in_flight >= waiter.policy.max_concurrent:
+                continue
+            if not self._fits(waiter.policy, waiter.cost):
+                break
+            self.waiters.remove(waiter)
+            self._admit(waiter.policy, waiter.cost)
+            waiter.future.set_result(True)
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying admission control before requests reach the
+    routes. Bodies are buffered to estimate cost and replayed to the app.
+    """
+    
+    def __init__(self, app, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        policy = self.controller.policy_for(scope["method"], scope["path"])
+        if policy is None:
+            self.controller.counters['bypassed'] += 1
+            return await self.app(scope, receive, send)
+        
+        if policy.stream_body:
+            body, cost = None, 1
+        else:
+            body, more = await self._read_body(receive)
+            if more:
+                return await self._reject(send, 413, "Request body too large", None)
+            cost = self.controller.estimate_cost(body)
+        
+        try:
+            await self.controller.acquire(policy, cost)
+        except AdmissionRejected as e:
+            return await self._reject(send, e.status_code, e.detail, e.retry_after)
+        
+        replayed = body is None
+        
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+        
+        started = time.perf_counter()
+        try:
+            await self.app(scope, replay_receive, send)
+        finally:
+            self.controller.release(policy, cost, time.perf_counter() - started)
+    
+    async def _read_body(self, receive) -> Tuple[bytes, bool]:
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                return b"".join(chunks), False
+            chunks.append(message.get("body", b""))
+            size += len(chunks[-1])
+            if size > self.controller.max_body_bytes:
+                return b"", True
+            if not message.get("more_body", False):
+                return b"".join(chunks), False
+    
+    async def _reject(self, send, status_code: int, detail: str, retry_after: Optional[int]):
+        headers = [(b"content-type", b"application/json")]
+        if retry_after is not None:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
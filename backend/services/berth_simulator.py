@@ -0,0 +1,220 @@
+import asyncio
+import heapq
+from collections import deque
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+from models.maritime import Port, Route, Vessel, DistributionSummary, PortSimulationResult
+
+ARRIVAL = 0
+DEPARTURE = 1
+
+def simulate_port(config: Dict[str, Any], rng: np.random.Generator) -> Dict[str, Any]:
+    """
+    Simulate one replication of vessel arrivals, berth queuing, gang-driven
+    discharge and disruption delays at a single port
+    """
+    horizon = config['horizon_days']
+    discharge_days = config['vessel_discharge_days']
+    demurrage_rates = config['vessel_demurrage_per_day']
+    
+    # Poisson arrivals over the horizon
+    arrival_count = rng.poisson(config['arrivals_per_day'] * horizon)
+    arrival_times = np.sort(rng.uniform(0, horizon, arrival_count))
+    vessel_types = rng.integers(0, len(discharge_days), arrival_count)
+    disrupted = rng.random(arrival_count) < config['disruption_probability']
+    delays = np.where(disrupted, rng.exponential(config['mean_disruption_days'], arrival_count), 0.0)
+    
+    events = [(arrival_times[i], ARRIVAL, i) for i in range(arrival_count)]
+    heapq.heapify(events)
+    free_berths = config['berths']
+    queue = deque()
+    berth_start = np.zeros(arrival_count)
+    departure = np.zeros(arrival_count)
+    busy_days = 0.0
+    
+    while events:
+        now, kind, vessel = heapq.heappop(events)
+        if kind == ARRIVAL:
+            queue.append(vessel)
+        else:
+            free_berths += 1
+        
+        # Berth waiting vessels first come, first served
+        while free_berths and queue:
+            waiting = queue.popleft()
+            free_berths -= 1
+            service = discharge_days[vessel_types[waiting]] + delays[waiting]
+            berth_start[waiting] = now
+            departure[waiting] = now + service
+            # Only berth time inside the horizon counts towards utilization
+            busy_days += max(min(departure[waiting], horizon) - now, 0.0)
+            heapq.heappush(events, (departure[waiting], DEPARTURE, waiting))
+    
+    waiting_days = berth_start - arrival_times
+    turnaround_days = departure - arrival_times
+    rates = demurrage_rates[vessel_types]
+    demurrage = np.maximum(turnaround_days - config['laytime_days'], 0.0) * rates
+    labour = config['vessel_labour_cost'][vessel_types]
+    
+    return {
+        'waiting_days': waiting_days,
+        'turnaround_days': turnaround_days,
+        'demurrage': demurrage,
+        'cost': float(labour.sum() + demurrage.sum()),
+        'busy_days': busy_days
+    }
+
+def run_replications(configs: List[Dict[str, Any]], seeds: List[np.random.SeedSequence]) -> List[Dict[str, Any]]:
+    """
+    Run one batch of replications for every port; executed in pool workers
+    """
+    results = []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        results.append([simulate_port(config, rng) for config in configs])
+    return results
+
+class BerthSimulator:
+    """
+    Discrete-event simulator of port operations, replicated in parallel
+    across a process pool to produce distributions of turnaround time,
+    demurrage and cost
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self.batch_size = 50  # Replications per pool task
+        # Defaults used when a request leaves berths or discharge unset
+        self.berths = 2
+        self.gangs_per_vessel = 3
+        self.tons_per_gang_shift = 500
+        self.shifts_per_day = 3
+        self.cost_per_gang = 1000
+        self.laytime_days = 5
+        self.default_disruption_probability = 0.2
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def build_config(self, port: Port, vessels: List[Vessel], arrivals_per_day: float,
+                     horizon_days: float, arrival_growth: float = 1.0,
+                     disruption_probability: Optional[float] = None,
+                     berths: Optional[int] = None,
+                     discharge_capacity: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        """
+        Collect the per-port inputs of the simulation.
+        
+        With a discharge capacity from the gang schedules every vessel is
+        discharged at that rate; otherwise each vessel takes its own
+        discharge days, or the default gang rate when those are unset.
+        """
+        berths = self.berths if berths is None else berths
+        if berths < 1:
+            raise ValueError(f"Port {port.id} needs at least one berth")
+        if arrivals_per_day < 0 or arrival_growth < 0:
+            raise ValueError(f"Arrival rate of port {port.id} must not be negative")
+        if horizon_days <= 0:
+            raise ValueError("horizon_days must be positive")
+        if disruption_probability is None:
+            disruption_probability = self.default_disruption_probability
+        if not 0 <= disruption_probability <= 1:
+            raise ValueError(f"Disruption probability of port {port.id} must be between 0 and 1")
+        
+        tonnages = np.array([vessel.tonnage for vessel in vessels], dtype=float)
+        if discharge_capacity is not None:
+            discharge_days = tonnages / discharge_capacity['tons_per_day']
+            tons_per_gang_shift = discharge_capacity['tons_per_gang_shift']
+            cost_per_gang = discharge_capacity['cost_per_gang']
+        else:
+            default_days = tonnages / (self.gangs_per_vessel * self.tons_per_gang_shift * self.shifts_per_day)
+            own_days = np.array([vessel.discharge for vessel in vessels], dtype=float)
+            discharge_days = np.where(own_days > 0, own_days, default_days)
+            tons_per_gang_shift = self.tons_per_gang_shift
+            cost_per_gang = self.cost_per_gang
+        
+        return {
+            'horizon_days': horizon_days,
+            'arrivals_per_day': arrivals_per_day * arrival_growth,
+            'berths': berths,
+            'laytime_days': self.laytime_days,
+            'disruption_probability': disruption_probability,
+            'mean_disruption_days': port.average_delay_days or 0.0,
+            'vessel_discharge_days': discharge_days,
+            'vessel_labour_cost': np.ceil(tonnages / tons_per_gang_shift) * cost_per_gang,
+            # Holding cost per day, as used by the gang schedule optimizer
+            'vessel_demurrage_per_day': np.array(
+                [vessel.under_holding * vessel.tonnage for vessel in vessels], dtype=float
+            )
+        }
+    
+    def port_disruption_probabilities(self, routes: List[Route]) -> Dict[str, float]:
+        """
+        Mean disruption probability of the routes discharging at each port
+        """
+        probabilities: Dict[str, List[float]] = {}
+        for route in routes:
+            probabilities.setdefault(route.destination_port.id, []).append(route.disruption_probability)
+        return {port_id: float(np.mean(values)) for port_id, values in probabilities.items()}
+    
+    async def simulate(self, ports: List[Port], configs: List[Dict[str, Any]],
+                       replications: int, seed: Optional[int] = None) -> List[PortSimulationResult]:
+        """
+        Run replications in the process pool and summarize each port
+        """
+        seeds = np.random.SeedSequence(seed).spawn(replications)
+        batches = [seeds[i:i + self.batch_size] for i in range(0, replications, self.batch_size)]
+        
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        batch_results = await asyncio.gather(*[
+            loop.run_in_executor(pool, run_replications, configs, batch) for batch in batches
+        ])
+        replication_results = [result for batch in batch_results for result in batch]
+        
+        return [
+            self._summarize(port, config, [result[i] for result in replication_results])
+            for i, (port, config) in enumerate(zip(ports, configs))
+        ]
+    
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+    
+    def _summarize(self, port: Port, config: Dict[str, Any], results: List[Dict[str, Any]]) -> PortSimulationResult:
+        def collect(name: str) -> np.ndarray:
+            return np.concatenate([result[name] for result in results])
+        
+        vessel_count = sum(len(result['turnaround_days']) for result in results)
+        capacity = config['berths'] * config['horizon_days'] * len(results)
+        
+        return PortSimulationResult(
+            port=port,
+            replications=len(results),
+            vessels_per_replication=round(vessel_count / len(results), 2) if results else 0.0,
+            berth_utilization=round(sum(result['busy_days'] for result in results) / capacity, 4) if capacity else 0.0,
+            waiting_days=summarize_distribution(collect('waiting_days')),
+            turnaround_days=summarize_distribution(collect('turnaround_days')),
+            demurrage=summarize_distribution(collect('demurrage')),
+            cost_per_replication=summarize_distribution(np.array([result['cost'] for result in results]))
+        )
+
+def summarize_distribution(values: np.ndarray) -> DistributionSummary:
+    """
+    Summarize a sample by its mean and upper percentiles
+    """
+    if len(values) == 0:
+        return DistributionSummary(mean=0.0, p50=0.0, p90=0.0, p95=0.0, p99=0.0)
+    
+    p50, p90, p95, p99 = np.percentile(values, [50, 90, 95, 99])
+    return DistributionSummary(
+        mean=round(float(np.mean(values)), 2),
+        p50=round(float(p50), 2),
+        p90=round(float(p90), 2),
+        p95=round(float(p95), 2),
+        p99=round(float(p99), 2)
+    )
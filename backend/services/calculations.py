@@ -2,6 +2,14 @@ import numpy as np
 import pandas as pd
 from typing import List, Dict, Any
 from models.maritime import Route, Vessel, GangSchedule, Port
+from services.rollup import RollupTotals
+
+def round_cents(value):
+    """
+    Round a cost, or an array of costs, to cents. Scalar and vectorized
+    analyses share it so they agree to the cent.
+    """
+    return np.round(value, 2)
 
 class MaritimeCalculator:
     """
@@ -12,39 +20,40 @@ class MaritimeCalculator:
         self.base_cost_per_ton = 150  # Base cost per ton in USD
         self.risk_multiplier = 1.2   # Risk cost multiplier
         self.p95_confidence = 0.95   # P95 confidence level
+        self.distance_cost_per_nm = 0.5    # USD per nautical mile
+        self.uncertainty_buffer_rate = 0.15  # P95 uncertainty buffer on base cost
+        self.current_cost_uplift = 0.2     # Current operations cost premium
+        self.base_port_cost = 50           # Port cost before corruption and reliability adjustments
+        self.port_corruption_uplift = 0.1  # Port cost increase per unit of corruption index
+        self.port_reliability_discount = 0.05  # Port cost decrease per unit of reliability score
     
     def calculate_base_cost(self, route: Route) -> float:
         """
         Calculate base cost for a route
         """
-        # Base cost calculation based on distance, tonnage, and port factors
-        distance_cost = route.distance * 0.5  # $0.5 per nautical mile
-        port_cost = self._calculate_port_cost(route.destination_port)
-        
-        base_cost = distance_cost + port_cost
-        return round(base_cost, 2)
+        return round_cents(self._calculate_base_cost(route))
     
     def calculate_p95_cost(self, route: Route, risk_cost: float) -> float:
         """
         Calculate P95 cost (95th percentile cost)
         """
-        base_cost = self.calculate_base_cost(route)
+        base_cost = self._calculate_base_cost(route)
         
         # P95 cost includes base cost + risk cost + uncertainty buffer
-        uncertainty_buffer = base_cost * 0.15  # 15% uncertainty buffer
+        uncertainty_buffer = base_cost * self.uncertainty_buffer_rate
         p95_cost = base_cost + risk_cost + uncertainty_buffer
         
-        return round(p95_cost, 2)
+        return round_cents(p95_cost)
     
     def calculate_potential_savings(self, route: Route, base_cost: float, p95_cost: float) -> float:
         """
         Calculate potential savings compared to current operations
         """
-        # Assume current operations have 20% higher costs
-        current_cost = p95_cost * 1.2
+        # Assume current operations have higher costs
+        current_cost = p95_cost * (1 + self.current_cost_uplift)
         potential_savings = current_cost - p95_cost
         
-        return round(potential_savings, 2)
+        return round_cents(potential_savings)
     
     def calculate_total_expected_margin(self, historical_data: List[Dict]) -> float:
         """
@@ -78,6 +87,27 @@ class MaritimeCalculator:
         
         return round(uncertainty_cost, 2)
     
+    def calculate_total_expected_margin_from_rollup(self, totals: RollupTotals) -> float:
+        """
+        Calculate total expected margin per ton from pre-aggregated history
+        """
+        total_tonnage = totals.sum('tonnage')
+        if total_tonnage == 0:
+            return 0.0
+        
+        return round(totals.sum('margin') / total_tonnage, 2)
+    
+    def calculate_cost_of_uncertainty_from_rollup(self, totals: RollupTotals) -> float:
+        """
+        Calculate cost of uncertainty from pre-aggregated history
+        """
+        if totals.count('total_cost') < 2:
+            return 0.0
+        
+        uncertainty_cost = np.sqrt(totals.variance('total_cost')) * 0.1  # 10% of standard deviation
+        
+        return round(uncertainty_cost, 2)
+    
     def calculate_baseline_cost(self, baseline_data: Dict) -> float:
         """
         Calculate baseline cost for forecast
@@ -151,23 +181,20 @@ class MaritimeCalculator:
             'grand_total': round(vessel.grand_total, 2)
         }
     
-    def _calculate_port_cost(self, port: Port) -> float:
+    def calculate_port_cost(self, corruption_index, reliability_score):
         """
-        Calculate port-specific costs
+        Port cost from a port's corruption index and reliability score, each
+        0 when unknown; takes scalars or arrays
         """
-        base_port_cost = 50  # Base port cost
-        
-        # Adjust for corruption index
-        if port.corruption_index:
-            corruption_multiplier = 1 + (port.corruption_index * 0.1)
-            base_port_cost *= corruption_multiplier
-        
-        # Adjust for reliability
-        if port.reliability_score:
-            reliability_multiplier = 1 - (port.reliability_score * 0.05)
-            base_port_cost *= reliability_multiplier
-        
-        return round(base_port_cost, 2)
+        corruption_multiplier = 1 + corruption_index * self.port_corruption_uplift
+        reliability_multiplier = 1 - reliability_score * self.port_reliability_discount
+        return self.base_port_cost * corruption_multiplier * reliability_multiplier
+    
+    def _calculate_base_cost(self, route: Route) -> float:
+        # Base cost calculation based on distance and port factors, unrounded
+        distance_cost = route.distance * self.distance_cost_per_nm
+        port = route.destination_port
+        return distance_cost + self.calculate_port_cost(port.corruption_index or 0.0, port.reliability_score or 0.0)
     
     def calculate_route_efficiency(self, route: Route) -> Dict[str, float]:
         """
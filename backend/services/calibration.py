@@ -0,0 +1,353 @@
+import asyncio
+import glob
+import json
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple
+from services.risk_analyzer import RiskAnalyzer
+from services.snapshot import FileLock
+
+ACTIVE_FILE = "ACTIVE"
+LOCK_FILE = ".lock"
+MODEL_PATTERN = "risk-model-*.json"
+
+def fit_risk_model(history: Dict[str, np.ndarray], ports: Dict[str, np.ndarray],
+                   parameters: Dict[str, Any], prior_strength: float = 1.0,
+                   min_samples: int = 3, holdout_fraction: float = 0.25,
+                   seed: int = 0) -> Dict[str, Any]:
+    """
+    Fit corruption and weather risk parameters to realized route risk costs.
+    
+    A realized cost is modelled as a * (1 + 2c) + b_r + o, where c is the
+    destination port's corruption index, a = corruption weight * base cost,
+    b_r = weather weight * base cost * region multiplier, and o is the
+    weighted operational risk of the route. The operational weight is held
+    fixed, so o is subtracted from the target and records whose route (and
+    so o) is unknown are left out.
+    
+    The coefficients are solved by ridge regression shrunk towards the
+    current parameters, so sparse regions stay close to their hand-set
+    values. A random holdout of the records is kept out of the fit, and the
+    fitted and current parameters are both scored on it. Executed in pool
+    workers.
+    """
+    operational_risk = np.asarray(history['operational_risk'], dtype=float)
+    target = np.asarray(history['realized_risk_cost'], dtype=float)
+    target = target - parameters['operational_risk_weight'] * operational_risk
+    record_ports = np.asarray(history['port_id'])
+    
+    # Join records to port attributes through the sorted port ids
+    order = np.argsort(ports['id'])
+    sorted_ids = ports['id'][order]
+    if len(sorted_ids) == 0:
+        raise ValueError("No ports to calibrate against")
+    positions = np.minimum(np.searchsorted(sorted_ids, record_ports), len(sorted_ids) - 1)
+    known = (sorted_ids[positions] == record_ports) & np.isfinite(target)
+    rows = order[positions[known]]
+    y = target[known]
+    holdout_count = max(1, int(round(len(y) * holdout_fraction)))
+    if len(y) - holdout_count < min_samples:
+        raise ValueError(
+            f"At least {min_samples + holdout_count} history records with realized risk costs "
+            f"on known routes are required"
+        )
+    holdout = np.zeros(len(y), dtype=bool)
+    holdout[np.random.default_rng(seed).permutation(len(y))[:holdout_count]] = True
+    train = ~holdout
+    
+    corruption = np.nan_to_num(ports['corruption_index'][rows].astype(float), nan=0.0)
+    regions, region_index, counts = np.unique(ports['region'][rows], return_inverse=True, return_counts=True)
+    
+    features = np.zeros((len(y), len(regions) + 1))
+    features[:, 0] = 1 + 2 * corruption
+    features[np.arange(len(y)), region_index.reshape(-1) + 1] = 1.0
+    
+    weights = parameters['corruption_risk_weight'], parameters['weather_risk_weight']
+    base_risk_cost = parameters['base_risk_cost']
+    multipliers = parameters['weather_risk_multipliers']
+    prior = np.array(
+        [weights[0] * base_risk_cost] +
+        [weights[1] * base_risk_cost * multipliers.get(str(region), 1.0) for region in regions]
+    )
+    
+    gram = features[train].T @ features[train] + prior_strength * np.eye(len(prior))
+    coefficients = np.linalg.solve(gram, features[train].T @ y[train] + prior_strength * prior)
+    if np.any(coefficients <= 0):
+        raise ValueError("Fit produced non-positive risk components")
+    
+    # The best-observed region keeps its multiplier and anchors the weather
+    # scale. Only the products a and b_r are identified, so the base cost is
+    # chosen to keep the three weights summing to one
+    reference = int(np.argmax(counts))
+    weather_scale = coefficients[reference + 1] / multipliers.get(str(regions[reference]), 1.0)
+    fitted_base = (coefficients[0] + weather_scale) / (1 - parameters['operational_risk_weight'])
+    
+    fitted_multipliers = dict(multipliers)
+    for region, coefficient in zip(regions, coefficients[1:]):
+        fitted_multipliers[str(region)] = round(float(coefficient / weather_scale), 4)
+    
+    # Both models are judged on records the fit has not seen
+    residual_before = features[holdout] @ prior - y[holdout]
+    residual_after = features[holdout] @ coefficients - y[holdout]
+    total = np.sum((y[holdout] - y[holdout].mean()) ** 2)
+    
+    return {
+        'parameters': {
+            'corruption_risk_weight': round(float(coefficients[0] / fitted_base), 4),
+            'weather_risk_weight': round(float(weather_scale / fitted_base), 4),
+            'operational_risk_weight': parameters['operational_risk_weight'],
+            'base_risk_cost': round(float(fitted_base), 2),
+            'weather_risk_multipliers': fitted_multipliers
+        },
+        'metrics': {
+            'samples': int(train.sum()),
+            'holdout_samples': int(holdout_count),
+            'regions': [str(region) for region in regions],
+            'rmse_before': round(float(np.sqrt(np.mean(residual_before ** 2))), 2),
+            'rmse_after': round(float(np.sqrt(np.mean(residual_after ** 2))), 2),
+            'r_squared': round(float(1 - np.sum(residual_after ** 2) / total), 4) if total > 0 else None
+        }
+    }
+
+class RiskModelRegistry:
+    """
+    Versioned risk model parameters in a directory shared by all workers.
+    
+    Every model is an immutable JSON file; the ACTIVE pointer names the
+    version workers should apply and whether it is pinned.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def register(self, parameters: Dict[str, Any], metrics: Optional[Dict[str, Any]] = None,
+                 source: str = "calibration") -> Dict[str, Any]:
+        """
+        Store a new model version
+        """
+        with self._lock():
+            return self._register(parameters, metrics or {}, source)
+    
+    def bootstrap(self, parameters: Dict[str, Any]):
+        """
+        Register and activate the hand-set parameters as the first version,
+        unless a worker has already done so
+        """
+        with self._lock():
+            if self.get_active() is None:
+                model = self._register(parameters, {}, "default")
+                self._write_active(model['version'], False)
+    
+    def get_model(self, version: int) -> Dict[str, Any]:
+        try:
+            with open(self._model_path(version)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise KeyError(f"Risk model version {version} not found")
+    
+    def list_models(self) -> List[Dict[str, Any]]:
+        return [self.get_model(version) for version in self._versions()]
+    
+    def latest(self, source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        for version in reversed(self._versions()):
+            model = self.get_model(version)
+            if source is None or model['source'] == source:
+                return model
+        return None
+    
+    def get_active(self) -> Optional[Dict[str, Any]]:
+        """
+        Get the active version and pin flag, or None before bootstrap
+        """
+        try:
+            with open(os.path.join(self.directory, ACTIVE_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def activate(self, version: int, pinned: bool = False):
+        """
+        Point every worker at a stored version
+        """
+        self.get_model(version)
+        with self._lock():
+            self._write_active(version, pinned)
+    
+    def _register(self, parameters: Dict[str, Any], metrics: Dict[str, Any], source: str) -> Dict[str, Any]:
+        versions = self._versions()
+        model = {
+            'version': versions[-1] + 1 if versions else 1,
+            'source': source,
+            'created_at': time.time(),
+            'parameters': parameters,
+            'metrics': metrics
+        }
+        self._write_json(self._model_path(model['version']), model)
+        return model
+    
+    def _write_active(self, version: int, pinned: bool):
+        self._write_json(os.path.join(self.directory, ACTIVE_FILE), {'version': version, 'pinned': pinned})
+    
+    def _versions(self) -> List[int]:
+        paths = glob.glob(os.path.join(self.directory, MODEL_PATTERN))
+        return sorted(int(os.path.basename(path)[len("risk-model-"):-len(".json")]) for path in paths)
+    
+    def _model_path(self, version: int) -> str:
+        return os.path.join(self.directory, f"risk-model-{version:06d}.json")
+    
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    
+    def _lock(self) -> FileLock:
+        return FileLock(os.path.join(self.directory, LOCK_FILE))
+
+class RiskCalibrator:
+    """
+    Background job that refits the risk model to shipment history in a
+    process pool and hot-swaps accepted versions into the live analyzer
+    """
+    
+    def __init__(self, risk_analyzer: RiskAnalyzer, registry: RiskModelRegistry,
+                 load_training_data: Callable[[], Awaitable[Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]]],
+                 on_change: Optional[Callable[[], None]] = None):
+        self.risk_analyzer = risk_analyzer
+        self.registry = registry
+        self.load_training_data = load_training_data
+        self.on_change = on_change
+        self.interval_seconds = 3600.0   # Time between scheduled calibrations
+        self.sync_interval_seconds = 5.0  # How often workers check the active pointer
+        self.prior_strength = 1.0         # Pseudo-observations pulling towards the current model
+        self.min_samples = 3
+        self.last_run: Optional[Dict[str, Any]] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """
+        Apply the active model and start the schedule; must be called from
+        the event loop
+        """
+        self.registry.bootstrap(self.risk_analyzer.get_model_parameters())
+        self.sync()
+        
+        if self._task is None:
+            self._lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+    
+    def sync(self) -> bool:
+        """
+        Apply the active model version if this worker is behind
+        """
+        active = self.registry.get_active()
+        if active is None or active['version'] == self.risk_analyzer.parameters_version:
+            return False
+        
+        model = self.registry.get_model(active['version'])
+        self.risk_analyzer.apply_model_parameters(model['parameters'], model['version'])
+        if self.on_change is not None:
+            self.on_change()
+        return True
+    
+    async def calibrate(self) -> Dict[str, Any]:
+        """
+        Fit a new model and activate it if it beats the current one on
+        held-out records and no version is pinned
+        """
+        async with self._lock:
+            history, ports = await self.load_training_data()
+            current = self.risk_analyzer.get_model_parameters()
+            
+            loop = asyncio.get_running_loop()
+            try:
+                fit = await loop.run_in_executor(
+                    self._get_pool(), fit_risk_model, history, ports, current,
+                    self.prior_strength, self.min_samples
+                )
+            except ValueError as e:
+                self.last_run = {'finished_at': time.time(), 'accepted': False, 'reason': str(e)}
+                return self.last_run
+            
+            metrics = fit['metrics']
+            active = self.registry.get_active() or {}
+            if fit['parameters'] == current:
+                result = {'accepted': False, 'reason': "Fitted parameters match the active model"}
+            elif metrics['rmse_after'] >= metrics['rmse_before']:
+                result = {'accepted': False, 'reason': "Fit does not improve on the active model on held-out records"}
+            else:
+                model = self.registry.register(fit['parameters'], metrics)
+                result = {'accepted': True, 'version': model['version']}
+                if active.get('pinned'):
+                    result['reason'] = f"Version {active['version']} is pinned; new version not activated"
+                else:
+                    self.registry.activate(model['version'])
+                    self.sync()
+            
+            self.last_run = {'finished_at': time.time(), 'metrics': metrics, **result}
+            return self.last_run
+    
+    def activate(self, version: int, pinned: bool = False):
+        """
+        Roll back or forward to a stored version, optionally pinning it
+        against scheduled calibrations
+        """
+        self.registry.activate(version, pinned)
+        self.sync()
+    
+    def unpin(self):
+        active = self.registry.get_active()
+        if active is not None:
+            self.registry.activate(active['version'], pinned=False)
+    
+    def get_status(self) -> Dict[str, Any]:
+        active = self.registry.get_active() or {}
+        return {
+            'active_version': active.get('version'),
+            'pinned': active.get('pinned', False),
+            'applied_version': self.risk_analyzer.parameters_version,
+            'parameters': self.risk_analyzer.get_model_parameters(),
+            'last_run': self.last_run,
+            'models': self.registry.list_models()
+        }
+    
+    def _calibration_due(self) -> bool:
+        # Workers share the registry, so only one of them refits per interval
+        latest = self.registry.latest(source="calibration") or self.registry.latest()
+        last_times = [latest['created_at'] if latest else 0.0]
+        if self.last_run is not None:
+            last_times.append(self.last_run['finished_at'])
+        return time.time() - max(last_times) >= self.interval_seconds
+    
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=1)
+        return self._pool
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.sync_interval_seconds)
+            try:
+                self.sync()
+                if self._calibration_due():
+                    await self.calibrate()
+            except Exception:
+                # A failed run leaves the active model in place; retry later
+                continue
@@ -0,0 +1,163 @@
+import base64
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple, Union
+from models.maritime import Port, Vessel
+from services.snapshot import DataSnapshot
+
+# Reliability bands as [lower, upper) score ranges
+RELIABILITY_BANDS = [
+    ('low', 0.0, 0.5),
+    ('medium', 0.5, 0.8),
+    ('high', 0.8, float('inf'))
+]
+# Ports without a reliability score fall in this band
+UNKNOWN_RELIABILITY = 'unknown'
+RELIABILITY_LABELS = [name for name, _, _ in RELIABILITY_BANDS] + [UNKNOWN_RELIABILITY]
+
+class InMemoryCatalog:
+    """
+    Port and vessel catalogs held in memory, laid out like the tables of a
+    snapshot so they are indexed and paged the same way
+    """
+    
+    def __init__(self, ports: List[Port], vessels: List[Vessel], version: int = 0):
+        self.version = version
+        self._ports = ports
+        self._vessels = vessels
+        self.tables = {
+            'ports': {
+                'region': np.array([port.region for port in ports], dtype=str),
+                'country': np.array([port.country for port in ports], dtype=str),
+                'reliability_score': np.array(
+                    [np.nan if port.reliability_score is None else port.reliability_score for port in ports],
+                    dtype=float
+                )
+            },
+            'vessels': {
+                'tonnage': np.array([vessel.tonnage for vessel in vessels], dtype=float)
+            }
+        }
+    
+    def row_count(self, table: str) -> int:
+        return len(self._ports) if table == 'ports' else len(self._vessels)
+    
+    def port(self, row: int) -> Port:
+        return self._ports[row]
+    
+    def vessel(self, row: int) -> Vessel:
+        return self._vessels[row]
+
+class CatalogIndex:
+    """
+    Secondary indexes over the port and vessel catalogs of one snapshot, or
+    of an in-memory catalog when no snapshot is attached.
+    
+    Every index maps to sorted row numbers, so filters intersect cheaply and
+    pages are cut by row number without materializing the whole catalog.
+    """
+    
+    def __init__(self, snapshot: Union[DataSnapshot, InMemoryCatalog]):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        
+        ports = snapshot.tables['ports']
+        self.port_count = snapshot.row_count('ports')
+        self.ports_by_region = _group_rows(ports['region'])
+        self.ports_by_country = _group_rows(ports['country'])
+        self.ports_by_reliability = _group_rows(_reliability_bands(ports['reliability_score']))
+        
+        # Vessels sorted by tonnage for range lookups
+        tonnage = snapshot.tables['vessels']['tonnage']
+        self.vessel_count = snapshot.row_count('vessels')
+        self.vessels_by_tonnage = np.argsort(tonnage, kind='stable')
+        self.sorted_tonnage = tonnage[self.vessels_by_tonnage]
+    
+    def query_ports(self, region: Optional[str] = None, country: Optional[str] = None,
+                    reliability: Optional[str] = None) -> np.ndarray:
+        """
+        Get the sorted rows of ports matching every given filter
+        """
+        if reliability is not None and reliability not in RELIABILITY_LABELS:
+            raise ValueError(f"reliability must be one of: {', '.join(RELIABILITY_LABELS)}")
+        
+        filters = [
+            (self.ports_by_region, region),
+            (self.ports_by_country, country),
+            (self.ports_by_reliability, reliability)
+        ]
+        rows = None
+        for index, value in filters:
+            if value is None:
+                continue
+            matches = index.get(value, np.empty(0, dtype=np.int64))
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        
+        return np.arange(self.port_count) if rows is None else rows
+    
+    def query_vessels(self, min_tonnage: Optional[float] = None, max_tonnage: Optional[float] = None) -> np.ndarray:
+        """
+        Get the sorted rows of vessels within a tonnage range
+        """
+        if min_tonnage is None and max_tonnage is None:
+            return np.arange(self.vessel_count)
+        
+        start = 0 if min_tonnage is None else np.searchsorted(self.sorted_tonnage, min_tonnage, side='left')
+        end = self.vessel_count if max_tonnage is None else np.searchsorted(self.sorted_tonnage, max_tonnage, side='right')
+        return np.sort(self.vessels_by_tonnage[start:end])
+    
+    def page(self, rows: np.ndarray, cursor: Optional[str], limit: Optional[int]) -> Tuple[np.ndarray, Optional[str]]:
+        """
+        Cut one page from sorted rows, returning it with the next cursor
+        """
+        start = 0
+        if cursor:
+            version, after = decode_cursor(cursor)
+            if version != self.version:
+                raise ValueError("Cursor refers to a previous catalog version; restart pagination")
+            start = int(np.searchsorted(rows, after, side='right'))
+        
+        if limit is None:
+            return rows[start:], None
+        
+        page = rows[start:start + limit]
+        next_cursor = encode_cursor(self.version, int(page[-1])) if start + limit < len(rows) else None
+        return page, next_cursor
+
+def encode_cursor(version: int, row: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{row}".encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    try:
+        version, row = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split(':')
+        return int(version), int(row)
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor")
+
+def project(record: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """
+    Keep only the requested fields of a record
+    """
+    if not fields:
+        return record
+    return {field: record[field] for field in fields if field in record}
+
+def _group_rows(values: np.ndarray) -> Dict[str, np.ndarray]:
+    if len(values) == 0:
+        return {}
+    
+    keys, inverse = np.unique(values, return_inverse=True)
+    order = np.argsort(inverse.reshape(-1), kind='stable')
+    boundaries = np.cumsum(np.bincount(inverse.reshape(-1), minlength=len(keys)))[:-1]
+    return {
+        _label(key): rows
+        for key, rows in zip(keys, np.split(order, boundaries))
+    }
+
+def _reliability_bands(scores: np.ndarray) -> np.ndarray:
+    bands = np.full(len(scores), UNKNOWN_RELIABILITY, dtype=object)
+    for name, lower, upper in RELIABILITY_BANDS:
+        bands[(scores >= lower) & (scores < upper)] = name
+    return bands.astype(str)
+
+def _label(key) -> str:
+    return key.decode('utf-8') if isinstance(key, bytes) else str(key)
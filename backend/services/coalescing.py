@@ -0,0 +1,83 @@
+import asyncio
+import json
+from typing import Dict, Any, Optional, Callable, Awaitable, Set
+
+class SingleFlight:
+    """
+    Coalesces concurrent requests for the same result into one in-flight
+    computation whose outcome every caller receives
+    """
+    
+    def __init__(self, default_timeout: float = 30.0):
+        self.default_timeout = default_timeout
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self._tasks: Set[asyncio.Task] = set()  # The loop only holds weak references to tasks
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+    
+    @staticmethod
+    def make_key(namespace: str, payload: Dict[str, Any]) -> str:
+        """
+        Build a normalized key so equivalent payloads coalesce
+        """
+        return f"{namespace}:{json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)}"
+    
+    async def run(self, key: str, compute: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Join the in-flight computation for key, or start one.
+        
+        The timeout bounds the shared computation itself, so every caller of
+        a key that runs too long fails together and the next call retries.
+        """
+        self.calls += 1
+        
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            # Mark the outcome as retrieved even if every caller has gone away
+            future.add_done_callback(lambda done: done.cancelled() or done.exception())
+            self._in_flight[key] = future
+            self.executions += 1
+            task = asyncio.ensure_future(self._execute(key, future, compute, timeout or self.default_timeout))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            self.coalesced += 1
+        
+        # Shield so one cancelled caller does not cancel the shared result
+        return await asyncio.shield(future)
+    
+    async def _execute(self, key: str, future: asyncio.Future, compute: Callable[[], Awaitable[Any]], timeout: float):
+        try:
+            result = await asyncio.wait_for(compute(), timeout)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except asyncio.TimeoutError as e:
+            self.timeouts += 1
+            future.set_exception(e)
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+        finally:
+            if self._in_flight.get(key) is future:
+                del self._in_flight[key]
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get counters showing how much duplicate work was avoided
+        """
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'in_flight': len(self._in_flight),
+            'coalescing_ratio': round(self.coalesced / self.calls, 4) if self.calls else 0.0
+        }
@@ -0,0 +1,72 @@
+import numpy as np
+from typing import Dict, Any, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; JSON responses keep working without it
+    pa = None
+    pq = None
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+JSON_MEDIA_TYPE = "application/json"
+
+class ColumnarUnavailable(RuntimeError):
+    """
+    Raised when a columnar format is requested but pyarrow is not installed
+    """
+
+def negotiate_columnar_format(accept: Optional[str]) -> Optional[str]:
+    """
+    Pick the preferred columnar media type from an Accept header, or None
+    when JSON is acceptable or preferred
+    """
+    if not accept:
+        return None
+    
+    preferences = []
+    for position, part in enumerate(accept.split(',')):
+        pieces = [piece.strip() for piece in part.split(';')]
+        media_type = pieces[0].lower()
+        quality = 1.0
+        for parameter in pieces[1:]:
+            if parameter.startswith('q='):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            preferences.append((-quality, position, media_type))
+    
+    for _, _, media_type in sorted(preferences):
+        if media_type in (ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE):
+            return media_type
+        if media_type in (JSON_MEDIA_TYPE, 'application/*', '*/*'):
+            return None
+    
+    return None
+
+def encode_columns(columns: Dict[str, Any], media_type: str) -> bytes:
+    """
+    Encode equal-length column arrays as an Arrow IPC stream or Parquet file
+    """
+    if pa is None:
+        raise ColumnarUnavailable("Columnar export requires pyarrow to be installed")
+    
+    # Numeric numpy columns are wrapped without copying
+    table = pa.table({
+        name: pa.array(values) if isinstance(values, np.ndarray) else pa.array(list(values))
+        for name, values in columns.items()
+    })
+    
+    sink = pa.BufferOutputStream()
+    if media_type == ARROW_STREAM_MEDIA_TYPE:
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif media_type == PARQUET_MEDIA_TYPE:
+        pq.write_table(table, sink, compression='zstd')
+    else:
+        raise ValueError(f"Unsupported columnar media type: {media_type}")
+    
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,136 @@
+import asyncio
+import copy
+from typing import List, Dict, Any, Optional
+from models.maritime import Port, KPIData, ForecastData
+from services.calculations import MaritimeCalculator
+from services.data_processor import DataProcessor
+from services.risk_analyzer import RiskAnalyzer
+from services.rollup import RollupCube, period_start
+
+class DashboardPipeline:
+    """
+    KPI, forecast, strategic lever and sensitivity stages behind the
+    dashboard, shared by the individual endpoints and the fused one.
+    
+    A fused run loads the rollup cube, baseline data and port catalog once,
+    then runs all four stages together in worker threads, leaving the event
+    loop free. The KPI stage reads the cube under its lock, so shipments
+    folded in by other requests meanwhile land before or after it, never
+    halfway.
+    """
+    
+    def __init__(self, calculator: MaritimeCalculator, risk_analyzer: RiskAnalyzer,
+                 data_processor: DataProcessor):
+        self.calculator = calculator
+        self.risk_analyzer = risk_analyzer
+        self.data_processor = data_processor
+    
+    async def run(self, time_period: str = "quarterly", period: Optional[str] = None,
+                  port_id: Optional[str] = None, route_id: Optional[str] = None,
+                  ports: Optional[List[Port]] = None,
+                  budget_constraint: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Compute every dashboard panel from one load of the data
+        """
+        loads = [self.data_processor.get_rollup_cube(), self.data_processor.get_baseline_data()]
+        if ports is None:
+            loads.append(self.data_processor.get_all_ports())
+        cube, baseline_data, *catalog = await asyncio.gather(*loads)
+        ports = catalog[0] if catalog else ports
+        
+        # Every stage uses a copy taken here, so a risk model swapped in
+        # meanwhile never mixes into one run
+        analyzer = copy.copy(self.risk_analyzer)
+        stages = asyncio.gather(
+            asyncio.to_thread(self.compute_kpis, cube, analyzer, time_period, period, port_id, route_id),
+            asyncio.to_thread(self.compute_forecast, baseline_data, analyzer),
+            asyncio.to_thread(self.compute_strategic_levers, ports, budget_constraint, analyzer),
+            asyncio.to_thread(self.compute_sensitivity, ports, analyzer)
+        )
+        try:
+            kpis, forecast, strategic_levers, sensitivity_analysis = await stages
+        except BaseException:
+            stages.cancel()
+            await asyncio.gather(stages, return_exceptions=True)
+            raise
+        
+        return {
+            "kpis": kpis,
+            "forecast": forecast,
+            "strategic_levers": strategic_levers,
+            "sensitivity_analysis": sensitivity_analysis,
+            "risk_model_version": analyzer.parameters_version
+        }
+    
+    def compute_kpis(self, cube: RollupCube, analyzer: RiskAnalyzer, time_period: str,
+                     period: Optional[str] = None, port_id: Optional[str] = None,
+                     route_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        KPIs for one slice of the rollup cube, never touching raw rows
+        """
+        slice_filters = {"period": period, "port_id": port_id, "route_id": route_id}
+        # All three queries read the cube at the same state
+        with cube.lock:
+            totals = cube.aggregate(time_period, **slice_filters)
+            port_totals = cube.group_by(time_period, "port_id", **slice_filters)
+            period_totals = cube.group_by(time_period, "period", **slice_filters)
+        
+        total_expected_margin = self.calculator.calculate_total_expected_margin_from_rollup(totals)
+        disruption_probability = analyzer.calculate_avg_disruption_probability_from_rollup(totals)
+        cost_of_uncertainty = self.calculator.calculate_cost_of_uncertainty_from_rollup(totals)
+        top_ports_by_risk = analyzer.get_top_risk_ports_from_rollup(port_totals)
+        
+        # One trendline point per period of the grain, dated by its first day
+        # as charts parse ISO dates
+        trendline_data = self.data_processor.generate_trendline_data([
+            {"date": period_start(time_period, label), "total_cost": period_total.mean("total_cost")}
+            for label, period_total in period_totals.items()
+        ])
+        
+        return KPIData(
+            total_expected_margin=total_expected_margin,
+            disruption_probability=disruption_probability,
+            cost_of_uncertainty=cost_of_uncertainty,
+            top_ports_by_risk=top_ports_by_risk,
+            trendline_data=trendline_data
+        ).model_dump()
+    
+    def compute_forecast(self, baseline_data: Dict, analyzer: RiskAnalyzer) -> Dict[str, Any]:
+        """
+        Cost exposure forecast from baseline data
+        """
+        return ForecastData(
+            baseline_cost=self.calculator.calculate_baseline_cost(baseline_data),
+            potential_savings=self.calculator.calculate_potential_savings_scenarios(baseline_data),
+            cost_distribution=analyzer.generate_cost_distribution(baseline_data)
+        ).model_dump()
+    
+    def compute_strategic_levers(self, ports: List[Port], budget_constraint: Optional[float],
+                                 analyzer: RiskAnalyzer) -> List[Dict[str, Any]]:
+        """
+        Relationship, consolidation and oversight levers within budget, best
+        ROI first
+        """
+        strategic_levers = []
+        for port in ports:
+            for analyze in (analyzer.analyze_relationship_investment,
+                            analyzer.analyze_volume_consolidation,
+                            analyzer.analyze_oversight_investment):
+                lever = analyze(port)
+                if lever:
+                    strategic_levers.append(lever)
+        
+        if budget_constraint:
+            strategic_levers = [
+                lever for lever in strategic_levers
+                if lever.investment_required <= budget_constraint
+            ]
+        
+        strategic_levers.sort(key=lambda x: x.roi, reverse=True)
+        return [lever.model_dump() for lever in strategic_levers]
+    
+    def compute_sensitivity(self, ports: List[Port], analyzer: RiskAnalyzer) -> List[Dict[str, Any]]:
+        """
+        Corruption sensitivity of every port
+        """
+        return [analyzer.analyze_corruption_sensitivity(port).model_dump() for port in ports]
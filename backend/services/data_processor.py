@@ -1,87 +1,173 @@
+import asyncio
+import zlib
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from models.maritime import Port, Vessel, TrendlineDataPoint
+from services.snapshot import SnapshotStore, DataSnapshot
+from services.catalog import CatalogIndex, InMemoryCatalog
+from services.rollup import RollupCube
+from services.ingest import ShipmentLog
 
 class DataProcessor:
     """
     Data processing service for maritime operations
     """
     
-    def __init__(self):
+    def __init__(self, snapshot_store: Optional[SnapshotStore] = None,
+                 shipment_log: Optional[ShipmentLog] = None):
+        self.snapshot_store = snapshot_store
+        self.shipment_log = shipment_log
         self.mock_ports = self._create_mock_ports()
         self.mock_vessels = self._create_mock_vessels()
+        self.mock_history = self._create_mock_history()
+        self._catalog_index: Optional[CatalogIndex] = None
+        self._rollup_cube: Optional[RollupCube] = None
+        self._rollup_source: Optional[DataSnapshot] = None
+        self._rollup_rows = 0  # History rows already added to the cube
+        self._history_records: Optional[List[Dict]] = None
+        self._history_records_source: Optional[DataSnapshot] = None
+        self._fold_lock: Optional[asyncio.Lock] = None
+    
+    def publish_reference_snapshot(self, force: bool = False) -> Optional[int]:
+        """
+        Publish the reference data as the shared snapshot. Unless forced, the
+        current snapshot is kept when it already holds the same data, so
+        workers starting together publish once.
+        """
+        if self.snapshot_store is None:
+            return None
+        
+        if force:
+            return self.snapshot_store.publish(self.mock_ports, self.mock_vessels, self.mock_history)
+        return self.snapshot_store.publish_if_changed(
+            self.mock_ports, self.mock_vessels, self.mock_history
+        )
+    
+    def get_snapshot(self) -> Optional[DataSnapshot]:
+        """
+        Get the current shared data snapshot, if one is attached
+        """
+        if self.snapshot_store is None:
+            return None
+        
+        return self.snapshot_store.current()
+    
+    async def fold_ingested(self):
+        """
+        Fold shipments appended to the log by any worker into a new snapshot
+        version, so every worker reads them from the same memory map
+        """
+        if self.snapshot_store is None or self.shipment_log is None:
+            return
+        snapshot = self.get_snapshot()
+        if snapshot is not None and self.shipment_log.size() <= snapshot.log_offset:
+            return
+        
+        if self._fold_lock is None:
+            self._fold_lock = asyncio.Lock()
+        async with self._fold_lock:
+            # Folding rewrites the snapshot, so it runs in a thread; requests
+            # queued behind it are served by the one fold
+            if self.get_snapshot() is None:
+                await asyncio.to_thread(self.publish_reference_snapshot)
+            await asyncio.to_thread(self.snapshot_store.fold_history, self.shipment_log.read_from)
+    
+    def get_data_version(self) -> Tuple[int, int]:
+        """
+        Get a version that changes whenever the underlying data changes: the
+        snapshot version and the size of the shipment log
+        """
+        snapshot = self.get_snapshot()
+        return (
+            snapshot.version if snapshot is not None else 0,
+            self.shipment_log.size() if self.shipment_log is not None else 0
+        )
+    
+    def get_catalog_index(self) -> CatalogIndex:
+        """
+        Get secondary indexes for the current snapshot, rebuilding them when
+        a new snapshot version is attached. Without a snapshot the mock
+        catalog is indexed instead.
+        """
+        snapshot = self.get_snapshot()
+        index = self._catalog_index
+        if snapshot is None:
+            if index is None or not isinstance(index.snapshot, InMemoryCatalog):
+                vessels = [Vessel(**vessel) if isinstance(vessel, dict) else vessel for vessel in self.mock_vessels]
+                index = CatalogIndex(InMemoryCatalog(self.mock_ports, vessels))
+                self._catalog_index = index
+            return index
+        
+        if index is None or index.snapshot is not snapshot:
+            index = CatalogIndex(snapshot)
+            self._catalog_index = index
+        
+        return index
+    
+    async def get_rollup_cube(self) -> RollupCube:
+        """
+        Get the pre-aggregated shipment history, rebuilding it when a new
+        snapshot version is attached
+        """
+        await self.fold_ingested()
+        snapshot = self.get_snapshot()
+        cube = self._rollup_cube
+        source = self._rollup_source
+        if cube is not None and source is snapshot:
+            return cube
+        
+        # A version that only folded in more shipments extends the history of
+        # the one the cube was built from, so only the new rows are added
+        if (cube is None or snapshot is None or source is None
+                or snapshot.source_digest != source.source_digest or snapshot.log_offset < source.log_offset):
+            cube = RollupCube()
+            self._rollup_rows = 0
+        cube.add_columns(self._reference_history_columns(self._rollup_rows))
+        self._rollup_cube = cube
+        self._rollup_source = snapshot
+        self._rollup_rows = snapshot.row_count('history') if snapshot is not None else len(self.mock_history)
+        
+        return cube
+    
+    async def query_ports(self, region: Optional[str] = None, country: Optional[str] = None,
+                          reliability: Optional[str] = None, cursor: Optional[str] = None,
+                          limit: Optional[int] = None) -> Tuple[List[Port], Optional[str], int]:
+        """
+        Get one page of ports matching the filters, the next cursor and the
+        total number of matches
+        """
+        index = self.get_catalog_index()
+        rows = index.query_ports(region=region, country=country, reliability=reliability)
+        page, next_cursor = index.page(rows, cursor, limit)
+        return [index.snapshot.port(int(row)) for row in page], next_cursor, len(rows)
+    
+    async def query_vessels(self, min_tonnage: Optional[float] = None, max_tonnage: Optional[float] = None,
+                            cursor: Optional[str] = None, limit: Optional[int] = None) -> Tuple[List[Vessel], Optional[str], int]:
+        """
+        Get one page of vessels within a tonnage range, the next cursor and
+        the total number of matches
+        """
+        index = self.get_catalog_index()
+        rows = index.query_vessels(min_tonnage=min_tonnage, max_tonnage=max_tonnage)
+        page, next_cursor = index.page(rows, cursor, limit)
+        return [index.snapshot.vessel(int(row)) for row in page], next_cursor, len(rows)
     
     async def get_historical_data(self, time_period: str = "quarterly") -> List[Dict]:
         """
-        Get historical data for analysis
+        Get historical data for analysis. Records are materialized once per
+        snapshot version and shared by every caller, which must not modify them.
         """
-        # Mock historical data - replace with actual database queries
-        historical_data = [
-            {
-                'date': '2024-01-01',
-                'port_id': 'port_1',
-                'route_id': 'route_1',
-                'total_cost': 195000,
-                'tonnage': 1000,
-                'margin': 15000,
-                'disruption_probability': 0.25,
-                'risk_score': 0.7
-            },
-            {
-                'date': '2024-02-01',
-                'port_id': 'port_2',
-                'route_id': 'route_2',
-                'total_cost': 210000,
-                'tonnage': 1200,
-                'margin': 18000,
-                'disruption_probability': 0.15,
-                'risk_score': 0.4
-            },
-            {
-                'date': '2024-03-01',
-                'port_id': 'port_1',
-                'route_id': 'route_1',
-                'total_cost': 202000,
-                'tonnage': 1100,
-                'margin': 16000,
-                'disruption_probability': 0.20,
-                'risk_score': 0.6
-            },
-            {
-                'date': '2024-04-01',
-                'port_id': 'port_3',
-                'route_id': 'route_3',
-                'total_cost': 198000,
-                'tonnage': 950,
-                'margin': 14000,
-                'disruption_probability': 0.18,
-                'risk_score': 0.5
-            },
-            {
-                'date': '2024-05-01',
-                'port_id': 'port_2',
-                'route_id': 'route_2',
-                'total_cost': 205000,
-                'tonnage': 1150,
-                'margin': 17000,
-                'disruption_probability': 0.12,
-                'risk_score': 0.3
-            },
-            {
-                'date': '2024-06-01',
-                'port_id': 'port_1',
-                'route_id': 'route_1',
-                'total_cost': 208000,
-                'tonnage': 1050,
-                'margin': 15500,
-                'disruption_probability': 0.22,
-                'risk_score': 0.65
-            }
-        ]
+        await self.fold_ingested()
+        snapshot = self.get_snapshot()
+        if snapshot is None:
+            return self.mock_history
         
-        return historical_data
+        if self._history_records_source is not snapshot:
+            self._history_records = await asyncio.to_thread(snapshot.history_records)
+            self._history_records_source = snapshot
+        return self._history_records
     
     async def get_baseline_data(self) -> Dict:
         """
@@ -103,15 +189,16 @@ class DataProcessor:
         Generate trendline data for visualization
         """
         trendline_data = []
+        variances = _realized_variance([record.get('date', '') for record in historical_data])
         
-        for record in historical_data:
+        for record, variance in zip(historical_data, variances.tolist()):
             # Calculate expected cost (base cost + risk buffer)
             base_cost = record.get('total_cost', 0)
             risk_buffer = base_cost * 0.1  # 10% risk buffer
             expected_cost = base_cost + risk_buffer
             
             # Realized cost (actual cost with some variance)
-            realized_cost = base_cost * (1 + np.random.normal(0, 0.05))  # 5% variance
+            realized_cost = base_cost * (1 + variance)
             
             trendline_data.append(TrendlineDataPoint(
                 date=record.get('date', ''),
@@ -121,17 +208,89 @@ class DataProcessor:
         
         return trendline_data
     
+    async def get_history_columns(self) -> Dict[str, np.ndarray]:
+        """
+        Get shipment history, including ingested shipments, as zero-copy
+        column views of the snapshot
+        """
+        await self.fold_ingested()
+        return self._reference_history_columns()
+    
+    def _reference_history_columns(self, start: int = 0) -> Dict[str, np.ndarray]:
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return {name: column[start:] for name, column in snapshot.tables['history'].items()}
+        
+        return {
+            name: np.array([record.get(name) for record in self.mock_history[start:]])
+            for name in self.mock_history[0]
+        } if self.mock_history else {}
+    
+    async def get_risk_training_data(self, operational_risk: Dict[str, float]
+                                     ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Get realized risk costs by port with the operational risk of their
+        route (NaN where the route is unknown), and the port attributes they
+        are regressed on, as column arrays
+        """
+        history = await self.get_history_columns()
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            ports = snapshot.tables['ports']
+            port_columns = {
+                'id': np.char.decode(ports['id'], 'utf-8'),
+                'region': np.char.decode(ports['region'], 'utf-8'),
+                'corruption_index': ports['corruption_index']
+            }
+        else:
+            port_columns = {
+                'id': np.array([port.id for port in self.mock_ports], dtype=str),
+                'region': np.array([port.region for port in self.mock_ports], dtype=str),
+                'corruption_index': np.array([
+                    np.nan if port.corruption_index is None else port.corruption_index
+                    for port in self.mock_ports
+                ], dtype=float)
+            }
+        
+        route_ids = pd.Series(history.get('route_id', np.empty(0, dtype=str)), dtype=object)
+        return {
+            'port_id': history.get('port_id', np.empty(0, dtype=str)),
+            'operational_risk': route_ids.map(operational_risk).to_numpy(dtype=float, na_value=np.nan),
+            'realized_risk_cost': history.get('realized_risk_cost', np.empty(0)).astype(float)
+        }, port_columns
+    
+    def generate_trendline_columns(self, history_columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Vectorized trendline data for columnar export
+        """
+        base_cost = history_columns.get('total_cost', np.empty(0))
+        dates = history_columns.get('date', np.empty(0, dtype=str))
+        
+        return {
+            'date': dates,
+            'expected': base_cost * 1.1,  # 10% risk buffer
+            'realized': base_cost * (1 + _realized_variance(dates))
+        }
+    
     async def get_all_ports(self) -> List[Port]:
         """
         Get all available ports
         """
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.ports()
+        
         return self.mock_ports
     
     async def get_all_vessels(self) -> List[Vessel]:
         """
         Get all vessels
         """
-        return self.mock_vessels
+        snapshot = self.get_snapshot()
+        if snapshot is not None:
+            return snapshot.vessels()
+        
+        return [Vessel(**vessel) if isinstance(vessel, dict) else vessel for vessel in self.mock_vessels]
     
     def _create_mock_ports(self) -> List[Port]:
         """
@@ -170,6 +329,79 @@ class DataProcessor:
             )
         ]
     
+    def _create_mock_history(self) -> List[Dict]:
+        """
+        Create mock shipment history - replace with actual database queries
+        """
+        return [
+            {
+                'date': '2024-01-01',
+                'port_id': 'port_1',
+                'route_id': 'route_1',
+                'total_cost': 195000,
+                'tonnage': 1000,
+                'margin': 15000,
+                'disruption_probability': 0.25,
+                'risk_score': 0.7,
+                'realized_risk_cost': 7100
+            },
+            {
+                'date': '2024-02-01',
+                'port_id': 'port_2',
+                'route_id': 'route_2',
+                'total_cost': 210000,
+                'tonnage': 1200,
+                'margin': 18000,
+                'disruption_probability': 0.15,
+                'risk_score': 0.4,
+                'realized_risk_cost': 4100
+            },
+            {
+                'date': '2024-03-01',
+                'port_id': 'port_1',
+                'route_id': 'route_1',
+                'total_cost': 202000,
+                'tonnage': 1100,
+                'margin': 16000,
+                'disruption_probability': 0.20,
+                'risk_score': 0.6,
+                'realized_risk_cost': 6800
+            },
+            {
+                'date': '2024-04-01',
+                'port_id': 'port_3',
+                'route_id': 'route_3',
+                'total_cost': 198000,
+                'tonnage': 950,
+                'margin': 14000,
+                'disruption_probability': 0.18,
+                'risk_score': 0.5,
+                'realized_risk_cost': 6900
+            },
+            {
+                'date': '2024-05-01',
+                'port_id': 'port_2',
+                'route_id': 'route_2',
+                'total_cost': 205000,
+                'tonnage': 1150,
+                'margin': 17000,
+                'disruption_probability': 0.12,
+                'risk_score': 0.3,
+                'realized_risk_cost': 4450
+            },
+            {
+                'date': '2024-06-01',
+                'port_id': 'port_1',
+                'route_id': 'route_1',
+                'total_cost': 208000,
+                'tonnage': 1050,
+                'margin': 15500,
+                'disruption_probability': 0.22,
+                'risk_score': 0.65,
+                'realized_risk_cost': 7350
+            }
+        ]
+    
     def _create_mock_vessels(self) -> List[Vessel]:
         """
         Create mock vessel data
@@ -275,3 +507,13 @@ class DataProcessor:
         
         return forecast
 
+def _realized_variance(dates) -> np.ndarray:
+    """
+    Relative deviation of realized from expected base cost, 5% standard
+    deviation, seeded by date so every recompute reproduces the same values
+    """
+    labels, inverse = np.unique(np.asarray(dates, dtype=str), return_inverse=True)
+    draws = np.array([
+        np.random.default_rng(zlib.crc32(label.encode('utf-8'))).normal(0, 0.05) for label in labels
+    ], dtype=float)
+    return draws[inverse.reshape(-1)]
@@ -0,0 +1,229 @@
+import math
+import numpy as np
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional
+from models.maritime import Vessel, GangSchedule, GangAssignment, VesselDischargePlan
+from services.calculations import MaritimeCalculator
+
+class GangScheduleOptimizer:
+    """
+    Plans gang assignments for vessel discharge by dynamic programming.
+    
+    The port call window is split into shift slots taken from the gang
+    schedule templates for each day type. For every vessel the optimizer
+    chooses the number of gangs per slot that minimizes labour cost plus
+    vessel holding cost, subject to gang availability and a deadline.
+    """
+    
+    def __init__(self, calculator: MaritimeCalculator):
+        self.calculator = calculator
+        self.tons_per_gang_shift = 500  # MT discharged by one gang in one shift
+        self.max_gangs_per_vessel = 4   # Gangs that can work one vessel at once
+        self.max_plan_cells = 20_000_000  # Slot x gang-shift DP states per vessel
+    
+    def build_slots(self, gang_schedules: List[GangSchedule], start_date: date,
+                    window_days: int, holidays: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Expand gang schedule templates into the shift slots of the window
+        """
+        holidays = set(holidays or [])
+        slots = []
+        
+        for day in range(window_days):
+            current_date = start_date + timedelta(days=day)
+            if current_date.isoformat() in holidays:
+                day_type = 'holiday'
+            elif current_date.weekday() >= 5:
+                day_type = 'weekend'
+            else:
+                day_type = 'weekday'
+            
+            day_schedules = sorted(
+                (schedule for schedule in gang_schedules if schedule.day_type == day_type),
+                key=lambda schedule: schedule.shift_time
+            )
+            for shift, schedule in enumerate(day_schedules):
+                slots.append({
+                    'day': day,
+                    'day_type': day_type,
+                    'shift_time': schedule.shift_time,
+                    'cost_per_gang': schedule.cost_per_gang,
+                    'available_gangs': schedule.number_of_gangs,
+                    'shifts_in_day': len(day_schedules),
+                    # Calendar time of the shift start, in days from the window start
+                    'start': day + shift / len(day_schedules)
+                })
+        
+        return slots
+    
+    def discharge_capacity(self, gang_schedules: List[GangSchedule]) -> Dict[str, float]:
+        """
+        Average daily discharge rate and cost per gang-shift of one vessel
+        over a week of the schedules, capped at max_gangs_per_vessel
+        """
+        gang_shifts = 0.0
+        labour = 0.0
+        for day_type, days in (('weekday', 5), ('weekend', 2)):
+            for schedule in gang_schedules:
+                if schedule.day_type == day_type:
+                    gangs = min(max(schedule.number_of_gangs, 0), self.max_gangs_per_vessel)
+                    gang_shifts += days * gangs
+                    labour += days * gangs * schedule.cost_per_gang
+        
+        if not gang_shifts:
+            raise ValueError("Gang schedules provide no weekday or weekend gangs")
+        
+        return {
+            'tons_per_day': gang_shifts * self.tons_per_gang_shift / 7,
+            'tons_per_gang_shift': self.tons_per_gang_shift,
+            'cost_per_gang': labour / gang_shifts
+        }
+    
+    def plan_berth_lineup(self, vessels: List[Vessel], slots: List[Dict[str, Any]],
+                          arrival_days: Optional[Dict[str, int]] = None,
+                          deadline_days: Optional[Dict[str, int]] = None) -> List[VesselDischargePlan]:
+        """
+        Plan every vessel in the window against a shared gang pool.
+        
+        Vessels are planned in arrival order (highest holding cost first on
+        ties); each plan consumes gangs from the pool before the next vessel
+        is solved.
+        """
+        arrival_days = arrival_days or {}
+        deadline_days = deadline_days or {}
+        available = np.array([slot['available_gangs'] for slot in slots], dtype=int)
+        slot_days = np.array([slot['day'] for slot in slots], dtype=int)
+        window_days = int(slot_days.max()) + 1 if len(slots) else 0
+        
+        order = sorted(
+            vessels,
+            key=lambda vessel: (arrival_days.get(vessel.id, 0), -self._holding_cost_per_day(vessel))
+        )
+        
+        plans = {}
+        for vessel in order:
+            first_slot = int(np.searchsorted(slot_days, arrival_days.get(vessel.id, 0), side='left'))
+            end_slot = int(np.searchsorted(slot_days, deadline_days.get(vessel.id, window_days), side='left'))
+            
+            plan = self.plan_vessel(vessel, slots, available, first_slot, end_slot,
+                                    arrival_day=arrival_days.get(vessel.id, 0))
+            for assignment_slot, gangs in plan.pop('slot_gangs'):
+                available[assignment_slot] -= gangs
+            plans[vessel.id] = VesselDischargePlan(**plan)
+        
+        return [plans[vessel.id] for vessel in vessels]
+    
+    def plan_vessel(self, vessel: Vessel, slots: List[Dict[str, Any]], available: np.ndarray,
+                    first_slot: int, end_slot: int, arrival_day: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Solve one vessel's discharge plan over slots [first_slot, end_slot).
+        
+        Holding is charged for every calendar day at berth from arrival to
+        the end of the completing shift, so days without shifts (weekends,
+        holidays) cost holding while the vessel waits through them.
+        """
+        work = int(math.ceil(vessel.tonnage / self.tons_per_gang_shift))
+        if max(end_slot - first_slot, 1) * (work + 1) > self.max_plan_cells:
+            raise ValueError(
+                f"Vessel {vessel.id} needs {work} gang-shifts over {end_slot - first_slot} slots, "
+                f"too many to plan; raise tons_per_gang_shift or shorten the window"
+            )
+        holding_per_day = self._holding_cost_per_day(vessel)
+        
+        def idle_days(t: int) -> float:
+            # Time between the end of slot t and the start of the next slot
+            if t + 1 >= end_slot:
+                return 0.0
+            return slots[t + 1]['start'] - slots[t]['start'] - 1 / slots[t]['shifts_in_day']
+        
+        # cost_to_go[w] = cheapest way to discharge w remaining gang-shifts
+        # from the current slot on; infeasible states stay at infinity
+        remaining = np.arange(work + 1)
+        cost_to_go = np.full(work + 1, np.inf)
+        cost_to_go[0] = 0.0
+        decisions = []
+        
+        for t in range(end_slot - 1, first_slot - 1, -1):
+            slot = slots[t]
+            max_gangs = int(min(max(available[t], 0), self.max_gangs_per_vessel))
+            holding = holding_per_day / slot['shifts_in_day']
+            idle_holding = holding_per_day * idle_days(t)
+            
+            best = np.full(work + 1, np.inf)
+            best_gangs = np.zeros(work + 1, dtype=np.int16)
+            for gangs in range(max_gangs + 1):
+                # Finishing g units now leaves w - g (floored at zero) for later,
+                # and unfinished vessels also wait at berth until the next slot
+                left = np.maximum(remaining - gangs, 0)
+                candidate = (gangs * slot['cost_per_gang'] + holding
+                             + np.where(left > 0, idle_holding, 0.0) + cost_to_go[left])
+                improved = candidate < best
+                best[improved] = candidate[improved]
+                best_gangs[improved] = gangs
+            
+            best[0] = 0.0
+            best_gangs[0] = 0
+            cost_to_go = best
+            decisions.append(best_gangs)
+        
+        decisions.reverse()
+        
+        plan = {
+            'vessel_id': vessel.id,
+            'feasible': bool(np.isfinite(cost_to_go[work])),
+            'gang_shifts_required': work,
+            'labour_cost': 0.0,
+            'holding_cost': 0.0,
+            'total_cost': 0.0,
+            'gang_costs': {},
+            'assignments': [],
+            'slot_gangs': []
+        }
+        if not plan['feasible']:
+            return plan
+        
+        # Walk the decisions forward to recover the schedule; waiting from
+        # arrival to the first slot is held whatever the plan
+        left = work
+        assignments = []
+        holding_cost = 0.0
+        if work > 0 and arrival_day is not None:
+            holding_cost = holding_per_day * max(slots[first_slot]['start'] - arrival_day, 0.0)
+        for offset, best_gangs in enumerate(decisions):
+            if left <= 0:
+                break
+            t = first_slot + offset
+            slot = slots[t]
+            gangs = int(best_gangs[left])
+            holding_cost += holding_per_day / slot['shifts_in_day']
+            if gangs > 0:
+                assignments.append(GangAssignment(
+                    vessel_id=vessel.id,
+                    day=slot['day'],
+                    day_type=slot['day_type'],
+                    shift_time=slot['shift_time'],
+                    number_of_gangs=gangs,
+                    cost_per_gang=slot['cost_per_gang'],
+                    total_cost=round(gangs * slot['cost_per_gang'], 2)
+                ))
+                plan['slot_gangs'].append((t, gangs))
+            left -= gangs
+            if left > 0:
+                holding_cost += holding_per_day * idle_days(t)
+            else:
+                plan['completion_day'] = slot['day']
+                plan['completion_shift'] = slot['shift_time']
+        
+        gang_costs = self.calculator.calculate_gang_costs(assignments)
+        plan.update({
+            'labour_cost': gang_costs['total'],
+            'holding_cost': round(holding_cost, 2),
+            'total_cost': round(gang_costs['total'] + holding_cost, 2),
+            'gang_costs': gang_costs,
+            'assignments': assignments
+        })
+        return plan
+    
+    def _holding_cost_per_day(self, vessel: Vessel) -> float:
+        # under_holding is quoted per ton, charged for each day at berth
+        return vessel.under_holding * vessel.tonnage
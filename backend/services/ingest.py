@@ -0,0 +1,337 @@
+import asyncio
+import csv
+import fcntl
+import io
+import json
+import os
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Tuple, Callable, AsyncIterator
+from services.snapshot import HISTORY_STRING_COLUMNS, HISTORY_NUMERIC_COLUMNS
+
+NDJSON_MEDIA_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+CSV_MEDIA_TYPES = ('text/csv', 'application/csv')
+
+# Column order of the shipment log; the same layout as snapshot history
+LOG_COLUMNS = HISTORY_STRING_COLUMNS + HISTORY_NUMERIC_COLUMNS
+REQUIRED_NUMERIC_COLUMNS = ['total_cost', 'tonnage', 'margin']
+
+class ShipmentSchemaError(ValueError):
+    """
+    Raised when a stream lacks required fields, which no record can fix
+    """
+
+class ShipmentLog:
+    """
+    Append-only CSV log of ingested shipments shared by all workers.
+    
+    Appends take an exclusive flock and are fsynced before returning, so a
+    returned byte offset is durable. Readers tail the file from the last
+    offset they consumed.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    def size(self) -> int:
+        try:
+            return os.stat(self.path).st_size
+        except FileNotFoundError:
+            return 0
+    
+    def append(self, data: bytes) -> int:
+        """
+        Durably append whole lines, returning the offset they start at
+        """
+        with open(self.path, 'ab') as handle:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+            try:
+                start = handle.seek(0, os.SEEK_END)
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        return start
+    
+    def read_from(self, offset: int) -> Tuple[Dict[str, np.ndarray], int]:
+        """
+        Read the complete records after an offset as column arrays, with the
+        offset to resume from
+        """
+        try:
+            with open(self.path, 'rb') as handle:
+                handle.seek(offset)
+                data = handle.read()
+        except FileNotFoundError:
+            return {}, offset
+        
+        # A record being appended by another worker is left for the next read
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return {}, offset
+        
+        frame = pd.read_csv(
+            io.BytesIO(data[:end]), header=None, names=LOG_COLUMNS,
+            dtype={name: str for name in HISTORY_STRING_COLUMNS}, keep_default_na=False,
+            na_values={name: [''] for name in HISTORY_NUMERIC_COLUMNS}
+        )
+        columns = {name: frame[name].to_numpy(dtype=str) for name in HISTORY_STRING_COLUMNS}
+        columns.update({name: frame[name].to_numpy(dtype=float) for name in HISTORY_NUMERIC_COLUMNS})
+        return columns, offset + end
+
+def parse_shipments(data: bytes, media_type: str, csv_header: Optional[bytes] = None) -> pd.DataFrame:
+    """
+    Parse a block of complete NDJSON lines or CSV rows into a frame
+    """
+    if media_type in CSV_MEDIA_TYPES:
+        return pd.read_csv(io.BytesIO((csv_header or b'') + data), dtype=str, keep_default_na=False)
+    return pd.read_json(io.BytesIO(data), lines=True, dtype=False, convert_dates=False)
+
+def parse_shipment_lines(lines: List[bytes], line_numbers: np.ndarray, media_type: str,
+                         csv_header: Optional[bytes] = None) -> Tuple[pd.DataFrame, np.ndarray, List[Dict[str, Any]]]:
+    """
+    Parse records one line at a time, returning the frame of the lines that
+    parsed, their line numbers and errors for the lines that did not
+    """
+    header = None
+    if media_type in CSV_MEDIA_TYPES:
+        header = next(csv.reader([(csv_header or b'').decode('utf-8').rstrip('\r\n')]), [])
+    
+    records = []
+    parsed = []
+    errors = []
+    for line, number in zip(lines, line_numbers):
+        try:
+            if header is not None:
+                values = next(csv.reader([line.decode('utf-8').rstrip('\r')]))
+                if len(values) != len(header):
+                    raise ValueError(f"expected {len(header)} fields, got {len(values)}")
+                record = dict(zip(header, values))
+            else:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("a record must be a JSON object")
+        except ValueError as e:
+            errors.append({'line': int(number), 'errors': [f"Could not parse line: {e}"]})
+            continue
+        records.append(record)
+        parsed.append(number)
+    
+    return pd.DataFrame.from_records(records), np.array(parsed, dtype=int), errors
+
+def validate_shipments(frame: pd.DataFrame, line_numbers: np.ndarray,
+                       max_errors: int = 100) -> Tuple[pd.DataFrame, int, List[Dict[str, Any]]]:
+    """
+    Vectorized validation of a batch of shipment records.
+    
+    Returns the valid records normalized to the log layout, the number of
+    rejected records and errors for the first rejected lines, numbered by
+    the line_numbers of the frame's rows.
+    """
+    missing = [name for name in HISTORY_STRING_COLUMNS + REQUIRED_NUMERIC_COLUMNS if name not in frame.columns]
+    if missing:
+        raise ShipmentSchemaError(f"Missing required fields: {', '.join(missing)}")
+    
+    normalized = pd.DataFrame(index=frame.index)
+    checks = []
+    
+    for name in ('port_id', 'route_id'):
+        values = frame[name].astype(str).str.strip()
+        normalized[name] = values
+        checks.append((f"{name} is required", frame[name].isna() | (values == '')))
+    
+    dates = pd.to_datetime(frame['date'].astype(str), errors='coerce', format='ISO8601')
+    normalized['date'] = dates.dt.strftime('%Y-%m-%d')
+    checks.append(("date must be an ISO date", dates.isna()))
+    
+    for name in HISTORY_NUMERIC_COLUMNS:
+        raw = frame[name] if name in frame.columns else pd.Series(np.nan, index=frame.index)
+        raw = raw.replace('', np.nan)
+        values = pd.to_numeric(raw, errors='coerce')
+        normalized[name] = values
+        checks.append((f"{name} must be a number", raw.notna() & values.isna()))
+        if name in REQUIRED_NUMERIC_COLUMNS:
+            checks.append((f"{name} is required", raw.isna()))
+    
+    checks.append(("tonnage must be positive", normalized['tonnage'] <= 0))
+    checks.append(("total_cost must not be negative", normalized['total_cost'] < 0))
+    checks.append((
+        "disruption_probability must be between 0 and 1",
+        (normalized['disruption_probability'] < 0) | (normalized['disruption_probability'] > 1)
+    ))
+    
+    invalid = np.zeros(len(frame), dtype=bool)
+    for _, mask in checks:
+        invalid |= mask.to_numpy(dtype=bool)
+    
+    errors = []
+    for row in np.flatnonzero(invalid)[:max_errors]:
+        errors.append({
+            'line': int(line_numbers[row]),
+            'errors': [message for message, mask in checks if mask.iloc[row]]
+        })
+    
+    return normalized.loc[~invalid, LOG_COLUMNS], int(invalid.sum()), errors
+
+def encode_log_records(records: pd.DataFrame) -> bytes:
+    return records.to_csv(header=False, index=False, lineterminator='\n').encode('utf-8')
+
+class ShipmentIngestor:
+    """
+    Group commit of validated shipment batches to the shipment log.
+    
+    Batches submitted while a commit is in progress are written and fsynced
+    together by the next commit, so concurrent streams share the cost of
+    each fsync. Disk writes run in a worker thread and never block reads.
+    """
+    
+    def __init__(self, log: ShipmentLog, on_commit: Optional[Callable[[], None]] = None):
+        self.log = log
+        self.on_commit = on_commit
+        self.max_batch_delay = 0.002  # Seconds to wait for more batches before committing
+        self.batch_bytes = 1024 * 1024  # Stream bytes validated together as one micro-batch
+        self.max_outstanding = 4        # Micro-batches of one stream awaiting commit
+        self.max_errors = 100
+        self.commits = 0
+        self.records = 0
+        self.bytes = 0
+        self._pending: List[Tuple[bytes, int, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+    
+    async def submit(self, payload: bytes, records: int) -> Tuple[int, int]:
+        """
+        Queue encoded records for the next group commit and wait until they
+        are durable, returning their byte range in the log
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((payload, records, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush())
+        return await future
+    
+    async def ingest_stream(self, stream: AsyncIterator[bytes], media_type: str) -> Dict[str, Any]:
+        """
+        Validate and commit a stream of NDJSON lines or CSV rows in
+        micro-batches, acknowledging the durable byte ranges written.
+        
+        A batch that fails schema validation stops the stream; its error is
+        returned as 'detail' alongside the ranges committed before it.
+        """
+        result = {'accepted': 0, 'rejected': 0, 'errors': [], 'ranges': []}
+        outstanding = set()
+        csv_header = None
+        next_line = 1
+        buffer = b''
+        
+        async def process(block: bytes):
+            nonlocal csv_header, next_line
+            if media_type in CSV_MEDIA_TYPES and csv_header is None:
+                split = block.find(b'\n') + 1
+                csv_header, block = block[:split], block[split:]
+                next_line += 1
+            first_line = next_line
+            next_line += block.count(b'\n')
+            if not block.strip():
+                return
+            
+            # Parsing and validation run in a thread, off the event loop
+            payload, accepted, rejected, errors = await asyncio.to_thread(
+                self._prepare, block, media_type, csv_header, first_line
+            )
+            result['accepted'] += accepted
+            result['rejected'] += rejected
+            result['errors'].extend(errors[:self.max_errors - len(result['errors'])])
+            if accepted:
+                outstanding.add(asyncio.ensure_future(self.submit(payload, accepted)))
+            
+            # Bound the batches of this stream waiting for commit
+            while len(outstanding) >= self.max_outstanding:
+                done, _ = await asyncio.wait(outstanding, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outstanding.discard(task)
+                    result['ranges'].append(task.result())
+        
+        try:
+            async for data in stream:
+                buffer += data
+                if len(buffer) < self.batch_bytes:
+                    continue
+                split = buffer.rfind(b'\n') + 1
+                if split:
+                    block, buffer = buffer[:split], buffer[split:]
+                    await process(block)
+            if buffer.strip():
+                await process(buffer if buffer.endswith(b'\n') else buffer + b'\n')
+        except ShipmentSchemaError as e:
+            result['detail'] = str(e)
+        finally:
+            # Records already handed over are committed even if the stream fails
+            if outstanding:
+                await asyncio.wait(outstanding)
+        
+        for task in outstanding:
+            result['ranges'].append(task.result())
+        result['ranges'].sort()
+        result['commits'] = len(result['ranges'])
+        result['durable_offset'] = result['ranges'][-1][1] if result['ranges'] else None
+        return result
+    
+    def _prepare(self, block: bytes, media_type: str, csv_header: Optional[bytes],
+                 first_line: int) -> Tuple[bytes, int, int, List[Dict[str, Any]]]:
+        # Parsers skip blank lines, so number records by their physical line
+        lines = block.split(b'\n')[:-1]
+        line_numbers = first_line + np.flatnonzero([bool(line.strip()) for line in lines])
+        parse_errors = []
+        try:
+            frame = parse_shipments(block, media_type, csv_header)
+            if len(frame) != len(line_numbers):
+                raise ValueError("records do not match lines")
+        except ValueError:
+            # Fall back to line by line so a malformed line only rejects itself
+            frame, line_numbers, parse_errors = parse_shipment_lines(
+                [lines[number - first_line] for number in line_numbers], line_numbers, media_type, csv_header
+            )
+            if frame.empty:
+                return b'', 0, len(parse_errors), parse_errors[:self.max_errors]
+        
+        try:
+            valid, rejected, errors = validate_shipments(frame, line_numbers, self.max_errors)
+        except ShipmentSchemaError as e:
+            raise ShipmentSchemaError(f"Lines {first_line}-{first_line + len(lines) - 1}: {e}") from e
+        errors = sorted(parse_errors + errors, key=lambda error: error['line'])[:self.max_errors]
+        return encode_log_records(valid), len(valid), rejected + len(parse_errors), errors
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'commits': self.commits,
+            'records': self.records,
+            'bytes': self.bytes,
+            'records_per_commit': round(self.records / self.commits, 2) if self.commits else 0.0,
+            'pending_batches': len(self._pending),
+            'durable_offset': self.log.size()
+        }
+    
+    async def _flush(self):
+        while self._pending:
+            await asyncio.sleep(self.max_batch_delay)
+            group, self._pending = self._pending, []
+            data = b''.join(payload for payload, _, _ in group)
+            try:
+                offset = await asyncio.to_thread(self.log.append, data)
+            except Exception as e:
+                for _, _, future in group:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            
+            for payload, records, future in group:
+                if not future.done():
+                    future.set_result((offset, offset + len(payload)))
+                offset += len(payload)
+                self.records += records
+            self.commits += 1
+            self.bytes += len(data)
+            if self.on_commit is not None:
+                self.on_commit()
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from typing import Dict, Any, Optional, Callable, Awaitable, Set
+
+class KPISubscriber:
+    """
+    One connected dashboard with a bounded queue of encoded events
+    """
+    
+    def __init__(self, max_pending: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self.dropped_events = 0
+        self.resyncs = 0
+
+class KPIBroadcaster:
+    """
+    Pushes KPI, trendline and top-risk-port changes to subscribers.
+    
+    The payload is recomputed only when the data version changes, diffed
+    against the previous payload, encoded once and fanned out to every
+    subscriber. A subscriber that falls behind has its backlog replaced by a
+    single full snapshot instead of growing without bound.
+    """
+    
+    def __init__(self, compute: Callable[[], Awaitable[Dict[str, Any]]],
+                 data_version: Callable[[], Any], poll_interval: float = 1.0,
+                 max_pending: int = 16):
+        self.compute = compute
+        self.data_version = data_version
+        self.poll_interval = poll_interval
+        self.max_pending = max_pending
+        self.version = 0
+        self.payload: Optional[Dict[str, Any]] = None
+        self.computations = 0
+        self.subscribers: Set[KPISubscriber] = set()
+        self._data_version = None
+        self._snapshot_event: Optional[str] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        """
+        Start watching the data version; must be called from the event loop
+        """
+        if self._task is None:
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._task = asyncio.ensure_future(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    def notify(self):
+        """
+        Ask for an immediate data version check, e.g. after a write
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+    
+    async def subscribe(self) -> KPISubscriber:
+        """
+        Register a subscriber and queue the current full payload for it
+        """
+        self.start()
+        if self.payload is None:
+            await self.refresh()
+        
+        subscriber = KPISubscriber(self.max_pending)
+        subscriber.queue.put_nowait(self._snapshot_event)
+        self.subscribers.add(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: KPISubscriber):
+        self.subscribers.discard(subscriber)
+    
+    async def refresh(self) -> bool:
+        """
+        Recompute and broadcast if the data version changed
+        """
+        async with self._lock:
+            return await self._refresh()
+    
+    async def _refresh(self) -> bool:
+        data_version = self.data_version()
+        if self.payload is not None and data_version == self._data_version:
+            return False
+        
+        payload = await self.compute()
+        self.computations += 1
+        self._data_version = data_version
+        
+        changes = diff_payload(self.payload, payload)
+        self.payload = payload
+        if not changes:
+            return False
+        
+        self.version += 1
+        self._snapshot_event = encode_event('snapshot', self.version, payload)
+        self._broadcast(encode_event('delta', self.version, changes))
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'version': self.version,
+            'subscribers': len(self.subscribers),
+            'computations': self.computations,
+            'dropped_events': sum(subscriber.dropped_events for subscriber in self.subscribers),
+            'resyncs': sum(subscriber.resyncs for subscriber in self.subscribers)
+        }
+    
+    def _broadcast(self, event: str):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client: its pending deltas are superseded by one snapshot
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                    subscriber.dropped_events += 1
+                subscriber.resyncs += 1
+                subscriber.queue.put_nowait(self._snapshot_event)
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            
+            if not self.subscribers:
+                continue
+            try:
+                await self.refresh()
+            except Exception:
+                # Keep serving the last good payload; retry on the next tick
+                continue
+
+def diff_payload(old: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Top-level delta between payloads. Lists that did not shrink are sent
+    point by point: the changed items by index and the appended tail.
+    """
+    if old is None:
+        return {key: {'set': value} for key, value in new.items()}
+    
+    changes = {}
+    for key, value in new.items():
+        previous = old.get(key)
+        if previous == value:
+            continue
+        if isinstance(previous, list) and isinstance(value, list) and len(value) >= len(previous):
+            updated = {i: item for i, (old_item, item) in enumerate(zip(previous, value)) if old_item != item}
+            # A list whose every item changed is cheaper to replace
+            if not previous or len(updated) < len(previous):
+                change = {}
+                if updated:
+                    change['update'] = updated
+                if len(value) > len(previous):
+                    change['append'] = value[len(previous):]
+                changes[key] = change
+                continue
+        changes[key] = {'set': value}
+    for key in old:
+        if key not in new:
+            changes[key] = {'remove': True}
+    return changes
+
+def encode_event(event: str, version: int, data: Dict[str, Any]) -> str:
+    """
+    Encode a server-sent event once for all subscribers
+    """
+    return f"event: {event}\nid: {version}\ndata: {json.dumps(data, default=str)}\n\n"
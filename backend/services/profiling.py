@@ -0,0 +1,199 @@
+import asyncio
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from typing import List, Dict, Any, Optional
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+# Long-lived streams and the admin endpoints themselves are never profiled
+UNPROFILED_PREFIXES = ("/api/admin/", "/api/stream/")
+
+class StackSampler:
+    """
+    Samples the call stack of one thread at a fixed interval from a
+    background thread, counting identical stacks
+    """
+    
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+    
+    def start(self):
+        self._thread.start()
+    
+    def stop(self):
+        """
+        Signal the sampling thread to stop; join() waits for it to exit
+        """
+        self._stopped.set()
+    
+    def join(self):
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+class RequestProfile:
+    """
+    One profiled request and its collapsed stacks
+    """
+    
+    def __init__(self, method: str, path: str, trigger: str, interval: float):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.interval = interval
+        self.started_at = time.time()
+        self.duration_ms: Optional[float] = None
+        self.status: Optional[int] = None
+        self.stacks: Counter = Counter()
+        self.samples = 0
+    
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'trigger': self.trigger,
+            'status': self.status,
+            'started_at': self.started_at,
+            'duration_ms': self.duration_ms,
+            'samples': self.samples,
+            'too_short_to_sample': self.too_short_to_sample,
+            'interval_ms': self.interval * 1000,
+            'top_functions': self.top_functions()
+        }
+    
+    @property
+    def too_short_to_sample(self) -> bool:
+        """
+        The request finished before the first stack sample was taken
+        """
+        return self.duration_ms is not None and self.samples == 0
+    
+    def top_functions(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Functions with the most samples at the top of the stack
+        """
+        leaves = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [
+            {'function': function, 'samples': count, 'share': round(count / self.samples, 4)}
+            for function, count in leaves.most_common(limit)
+        ]
+    
+    def collapsed(self) -> str:
+        """
+        Collapsed-stack text, as read by flamegraph.pl and speedscope
+        """
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class RequestProfiler:
+    """
+    Opt-in sampling profiler for individual requests.
+    
+    A request is profiled when it carries an X-Profile header or is picked
+    by the sample rate. Finished profiles are kept in a bounded ring buffer,
+    so the oldest are dropped first.
+    """
+    
+    def __init__(self, capacity: int = 50, sample_rate: float = 0.0, interval: float = 0.005,
+                 max_active: int = 2):
+        self.capacity = capacity
+        self.sample_rate = sample_rate  # Fraction of requests profiled without the header
+        self.interval = interval        # Seconds between stack samples
+        self.max_active = max_active    # Concurrent profiles; extra requests run unprofiled
+        self.profiles: deque = deque(maxlen=capacity)
+        self.active = 0
+    
+    def trigger(self, path: str, header: Optional[bytes]) -> Optional[str]:
+        """
+        Decide whether to profile a request, returning why
+        """
+        if not path.startswith("/api/") or path.startswith(UNPROFILED_PREFIXES):
+            return None
+        if header is not None and header.strip().lower() in (b"1", b"true", b"yes"):
+            return "header"
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+    
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self.profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+    
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """
+        Summaries of stored profiles, newest first
+        """
+        return [profile.summary() for profile in reversed(self.profiles)]
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that samples the event loop thread while a chosen
+    request is being served.
+    
+    Handlers and the calculations they call run on the loop thread, so its
+    stacks show where a slow request spends time. Other requests interleaved
+    at await points can appear in the same profile.
+    """
+    
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        
+        header = dict(scope["headers"]).get(PROFILE_HEADER)
+        trigger = self.profiler.trigger(scope["path"], header)
+        if trigger is None or self.profiler.active >= self.profiler.max_active:
+            return await self.app(scope, receive, send)
+        
+        profile = RequestProfile(scope["method"], scope["path"], trigger, self.profiler.interval)
+        sampler = StackSampler(threading.get_ident(), self.profiler.interval)
+        
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_ID_HEADER, profile.id.encode())]
+            await send(message)
+        
+        self.profiler.active += 1
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            sampler.stop()
+            self.profiler.active -= 1
+            profile.duration_ms = round((time.perf_counter() - started) * 1000, 2)
+            # The sampler can be mid-sample, so wait for it off the loop thread
+            await asyncio.to_thread(sampler.join)
+            profile.stacks = sampler.stacks
+            profile.samples = sampler.samples
+            self.profiler.profiles.append(profile)
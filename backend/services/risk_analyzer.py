@@ -2,6 +2,14 @@ import numpy as np
 import pandas as pd
 from typing import List, Dict, Any, Optional
 from models.maritime import Port, Route, StrategicLever, SensitivityAnalysis
+from services.rollup import RollupTotals
+from services.calculations import round_cents
+
+# Parameters that can be calibrated against realized costs
+MODEL_PARAMETERS = [
+    'corruption_risk_weight', 'weather_risk_weight', 'operational_risk_weight',
+    'base_risk_cost', 'weather_risk_multipliers'
+]
 
 class RiskAnalyzer:
     """
@@ -13,6 +21,41 @@ class RiskAnalyzer:
         self.weather_risk_weight = 0.3
         self.operational_risk_weight = 0.3
         self.base_risk_cost = 5000  # Base risk cost in USD
+        self.risk_threshold_high = 15000
+        self.risk_threshold_medium = 8000
+        self.corruption_risk_scale = 2       # Corruption risk increase per unit of corruption index
+        self.operational_risk_per_nm = 0.1   # Operational risk per nautical mile
+        self.operational_risk_per_day = 100  # Operational risk per day at sea
+        self.weather_risk_multipliers = {
+            'Asia': 1.2,
+            'Africa': 1.5,
+            'South America': 1.3,
+            'Europe': 1.0,
+            'North America': 1.1
+        }
+        self.parameters_version = 0  # Risk model version currently applied
+    
+    def get_model_parameters(self) -> Dict[str, Any]:
+        """
+        Get the calibratable risk model parameters
+        """
+        parameters = {name: getattr(self, name) for name in MODEL_PARAMETERS}
+        parameters['weather_risk_multipliers'] = dict(self.weather_risk_multipliers)
+        return parameters
+    
+    def apply_model_parameters(self, parameters: Dict[str, Any], version: int):
+        """
+        Swap in a risk model version.
+        
+        Runs on the event loop thread, where every risk computation also runs,
+        so no computation sees a mix of two versions. The multiplier table is
+        replaced rather than mutated so shallow copies keep the old one.
+        """
+        for name in MODEL_PARAMETERS:
+            if name in parameters:
+                value = parameters[name]
+                setattr(self, name, dict(value) if isinstance(value, dict) else value)
+        self.parameters_version = version
     
     def calculate_risk_cost(self, route: Route) -> float:
         """
@@ -25,7 +68,7 @@ class RiskAnalyzer:
         weather_risk = self._calculate_weather_risk(route.destination_port.region)
         
         # Operational risk (based on distance and complexity)
-        operational_risk = self._calculate_operational_risk(route)
+        operational_risk = self.calculate_operational_risk(route)
         
         # Total risk cost
         total_risk_cost = (
@@ -34,18 +77,15 @@ class RiskAnalyzer:
             operational_risk * self.operational_risk_weight
         )
         
-        return round(total_risk_cost, 2)
+        return round_cents(total_risk_cost)
     
     def get_route_recommendation(self, route: Route, risk_cost: float) -> str:
         """
         Get route recommendation based on risk analysis
         """
-        risk_threshold_high = 15000
-        risk_threshold_medium = 8000
-        
-        if risk_cost > risk_threshold_high:
+        if risk_cost > self.risk_threshold_high:
             return 'avoid'
-        elif risk_cost > risk_threshold_medium:
+        elif risk_cost > self.risk_threshold_medium:
             return 'caution'
         else:
             return 'use'
@@ -84,6 +124,27 @@ class RiskAnalyzer:
             for port_id, risks in port_risks.items()
         }
         
+        return self._top_risk_ports(port_avg_risks)
+    
+    def calculate_avg_disruption_probability_from_rollup(self, totals: RollupTotals) -> float:
+        """
+        Calculate average disruption probability from pre-aggregated history
+        """
+        return round(totals.mean('disruption_probability'), 2)
+    
+    def get_top_risk_ports_from_rollup(self, port_totals: Dict[str, RollupTotals]) -> List[Port]:
+        """
+        Get top ports by average risk score from per-port aggregates
+        """
+        port_avg_risks = {
+            port_id: totals.mean('risk_score')
+            for port_id, totals in port_totals.items()
+            if totals.count('risk_score')
+        }
+        
+        return self._top_risk_ports(port_avg_risks)
+    
+    def _top_risk_ports(self, port_avg_risks: Dict[str, float]) -> List[Port]:
         # Sort by risk and return top 5
         top_ports = sorted(port_avg_risks.items(), key=lambda x: x[1], reverse=True)[:5]
         
@@ -205,41 +266,54 @@ class RiskAnalyzer:
             break_even_point=break_even_point
         )
     
+    def analyze_corruption_sensitivity_columns(self, ports: List[Port]) -> Dict[str, np.ndarray]:
+        """
+        Vectorized corruption sensitivity analysis for columnar export
+        """
+        current_corruption_rate = np.array([port.corruption_index or 0.5 for port in ports], dtype=float)
+        corruption_threshold = np.full(len(ports), 0.3)  # 30% corruption threshold
+        
+        return {
+            'port_id': np.array([port.id for port in ports], dtype=str),
+            'port_name': np.array([port.name for port in ports], dtype=str),
+            'corruption_threshold': corruption_threshold,
+            'current_corruption_rate': current_corruption_rate,
+            'is_economical': current_corruption_rate <= corruption_threshold,
+            'break_even_point': corruption_threshold
+        }
+    
     def _calculate_corruption_risk(self, port: Port) -> float:
         """
         Calculate corruption risk for a port
         """
-        if not port.corruption_index:
-            return self.base_risk_cost
-        
-        # Corruption risk scales with corruption index
-        corruption_multiplier = 1 + (port.corruption_index * 2)
-        return self.base_risk_cost * corruption_multiplier
+        return self.base_risk_cost * self.calculate_corruption_multiplier(port.corruption_index or 0.0)
+    
+    def calculate_corruption_multiplier(self, corruption_index):
+        """
+        Corruption risk multiplier for a corruption index (0 when unknown);
+        takes scalars or arrays
+        """
+        return 1 + corruption_index * self.corruption_risk_scale
     
     def _calculate_weather_risk(self, region: str) -> float:
         """
         Calculate weather risk based on region
         """
-        weather_risk_multipliers = {
-            'Asia': 1.2,
-            'Africa': 1.5,
-            'South America': 1.3,
-            'Europe': 1.0,
-            'North America': 1.1
-        }
-        
-        multiplier = weather_risk_multipliers.get(region, 1.0)
+        multiplier = self.weather_risk_multipliers.get(region, 1.0)
         return self.base_risk_cost * multiplier
     
-    def _calculate_operational_risk(self, route: Route) -> float:
+    def calculate_operational_risk(self, route: Route) -> float:
         """
-        Calculate operational risk based on route characteristics
+        Calculate operational risk based on route characteristics, before
+        its weight is applied
         """
-        # Risk increases with distance
-        distance_risk = route.distance * 0.1
-        
-        # Risk increases with estimated days
-        time_risk = route.estimated_days * 100
-        
-        return distance_risk + time_risk
+        return self.calculate_distance_time_risk(route.distance, route.estimated_days)
+    
+    def calculate_distance_time_risk(self, distance, estimated_days):
+        """
+        Operational risk from route distance and duration; takes scalars or
+        arrays
+        """
+        # Risk increases with distance and with estimated days
+        return distance * self.operational_risk_per_nm + estimated_days * self.operational_risk_per_day
 
@@ -0,0 +1,237 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import List, Dict, Any, Optional, Tuple
+
+# Period grains and their pandas period frequencies
+ROLLUP_GRAINS = {
+    'monthly': 'M',
+    'quarterly': 'Q',
+    'yearly': 'Y'
+}
+ROLLUP_MEASURES = [
+    'margin', 'tonnage', 'total_cost', 'disruption_probability', 'risk_score', 'realized_risk_cost'
+]
+ROLLUP_DIMENSIONS = ['period', 'port_id', 'route_id']
+
+def period_start(grain: str, label: str) -> str:
+    """
+    ISO date of the first day of a period label of the grain, e.g. 2024Q2
+    at quarterly grain is 2024-04-01
+    """
+    return pd.Period(label, freq=ROLLUP_GRAINS[grain.strip().lower()]).start_time.date().isoformat()
+
+class RollupTotals:
+    """
+    Count, sum and sum of squares of every measure over a set of cells
+    """
+    
+    def __init__(self, measures: List[str], counts: np.ndarray, sums: np.ndarray, sums_sq: np.ndarray):
+        self._index = {measure: i for i, measure in enumerate(measures)}
+        self.counts = counts
+        self.sums = sums
+        self.sums_sq = sums_sq
+    
+    def count(self, measure: str) -> int:
+        return int(self.counts[self._index[measure]])
+    
+    def sum(self, measure: str) -> float:
+        return float(self.sums[self._index[measure]])
+    
+    def mean(self, measure: str) -> float:
+        count = self.count(measure)
+        return self.sum(measure) / count if count else 0.0
+    
+    def variance(self, measure: str) -> float:
+        """
+        Population variance, as np.var computes over raw rows
+        """
+        count = self.count(measure)
+        if not count:
+            return 0.0
+        mean = self.sum(measure) / count
+        return max(float(self.sums_sq[self._index[measure]]) / count - mean * mean, 0.0)
+
+class RollupCube:
+    """
+    Shipment history pre-aggregated at monthly, quarterly and yearly grains,
+    crossed with port and route.
+    
+    Each cell keeps the count, sum and sum of squares of every measure, which
+    is enough for totals, means and variances over any union of cells, so
+    KPIs for any period and slice never touch raw rows. New shipments are
+    folded into existing cells.
+    
+    Folds and queries hold the cube's lock, so a cube can be queried from
+    worker threads while shipments are folded in on the event loop; hold
+    the lock across several queries to read them all at one state.
+    """
+    
+    def __init__(self, measures: Optional[List[str]] = None):
+        self.measures = list(measures or ROLLUP_MEASURES)
+        self.row_count = 0
+        self.lock = threading.RLock()
+        self._grains = {grain: _GrainCells(len(self.measures)) for grain in ROLLUP_GRAINS}
+    
+    def add_columns(self, columns: Dict[str, np.ndarray]):
+        """
+        Fold a batch of shipments, given as column arrays, into every grain
+        """
+        count = len(columns.get('date', []))
+        if count == 0:
+            return
+        
+        values = np.column_stack([
+            np.asarray(columns[measure], dtype=float) if measure in columns else np.full(count, np.nan)
+            for measure in self.measures
+        ])
+        present = np.isfinite(values)
+        values = np.where(present, values, 0.0)
+        stacked = pd.DataFrame(np.hstack([present.astype(float), values, values * values]))
+        
+        # Shipments share few distinct dates, so periods are derived per date
+        dates, date_rows = np.unique(np.asarray(columns['date']).astype(str), return_inverse=True)
+        dates = pd.to_datetime(pd.Series(dates))
+        port_ids = np.asarray(columns['port_id']).astype(str)
+        route_ids = np.asarray(columns['route_id']).astype(str)
+        grouped_grains = {}
+        for grain, frequency in ROLLUP_GRAINS.items():
+            periods = dates.dt.to_period(frequency).astype(str).to_numpy()[date_rows.reshape(-1)]
+            grouped_grains[grain] = stacked.groupby([periods, port_ids, route_ids], sort=False).sum()
+        
+        # Only the cell updates need the lock; grouping ran without it
+        with self.lock:
+            for grain, grouped in grouped_grains.items():
+                self._grains[grain].add(list(grouped.index), grouped.to_numpy())
+            self.row_count += count
+    
+    def add_records(self, records: List[Dict[str, Any]]):
+        """
+        Fold new shipment records into the cube
+        """
+        if not records:
+            return
+        names = ['date', 'port_id', 'route_id'] + self.measures
+        self.add_columns({
+            name: np.array([record.get(name) for record in records], dtype=float if name in self.measures else object)
+            for name in names
+        })
+    
+    def aggregate(self, grain: str, period: Optional[str] = None, port_id: Optional[str] = None,
+                  route_id: Optional[str] = None) -> RollupTotals:
+        """
+        Total every measure over the cells matching the slice
+        """
+        cells = self._cells(grain)
+        with self.lock:
+            rows = cells.select(period, port_id, route_id)
+            counts, sums, sums_sq = cells.totals(rows)
+        return RollupTotals(self.measures, counts, sums, sums_sq)
+    
+    def group_by(self, grain: str, dimension: str, period: Optional[str] = None,
+                 port_id: Optional[str] = None, route_id: Optional[str] = None) -> Dict[str, RollupTotals]:
+        """
+        Total every measure per value of one dimension within the slice,
+        ordered by that value
+        """
+        if dimension not in ROLLUP_DIMENSIONS:
+            raise ValueError(f"Unknown rollup dimension: {dimension}")
+        
+        cells = self._cells(grain)
+        with self.lock:
+            rows = cells.select(period, port_id, route_id)
+            labels = cells.labels(dimension)[rows]
+            cell_counts, cell_sums, cell_sums_sq = cells.counts[rows], cells.sums[rows], cells.sums_sq[rows]
+        keys, inverse = np.unique(labels, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        
+        counts, sums, sums_sq = (
+            np.zeros((len(keys), len(self.measures))) for _ in range(3)
+        )
+        np.add.at(counts, inverse, cell_counts)
+        np.add.at(sums, inverse, cell_sums)
+        np.add.at(sums_sq, inverse, cell_sums_sq)
+        
+        return {
+            str(key): RollupTotals(self.measures, counts[i], sums[i], sums_sq[i])
+            for i, key in enumerate(keys)
+        }
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'rows': self.row_count,
+            'cells': {grain: len(cells) for grain, cells in self._grains.items()}
+        }
+    
+    def _cells(self, grain: str) -> '_GrainCells':
+        cells = self._grains.get(grain.strip().lower())
+        if cells is None:
+            raise ValueError(f"time_period must be one of: {', '.join(ROLLUP_GRAINS)}")
+        return cells
+
+class _GrainCells:
+    """
+    Cells of one grain in growable arrays, addressed by (period, port, route)
+    """
+    
+    def __init__(self, measure_count: int):
+        self.index: Dict[Tuple[str, str, str], int] = {}
+        self._labels: Dict[str, List[str]] = {dimension: [] for dimension in ROLLUP_DIMENSIONS}
+        self._label_arrays: Optional[Dict[str, np.ndarray]] = None
+        self._data = np.zeros((3, 16, measure_count))
+    
+    def __len__(self) -> int:
+        return len(self.index)
+    
+    @property
+    def counts(self) -> np.ndarray:
+        return self._data[0, :len(self.index)]
+    
+    @property
+    def sums(self) -> np.ndarray:
+        return self._data[1, :len(self.index)]
+    
+    @property
+    def sums_sq(self) -> np.ndarray:
+        return self._data[2, :len(self.index)]
+    
+    def add(self, keys: List[Tuple[str, str, str]], stacked: np.ndarray):
+        """
+        Add per-cell [counts | sums | sums of squares] rows, creating cells
+        for new keys
+        """
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self.index.get(key)
+            if row is None:
+                row = len(self.index)
+                self.index[key] = row
+                for dimension, label in zip(ROLLUP_DIMENSIONS, key):
+                    self._labels[dimension].append(label)
+                self._label_arrays = None
+            rows[i] = row
+        
+        if len(self.index) > self._data.shape[1]:
+            grown = np.zeros((3, max(len(self.index), 2 * self._data.shape[1]), self._data.shape[2]))
+            grown[:, :self._data.shape[1]] = self._data
+            self._data = grown
+        
+        # Keys are unique within a batch, so plain fancy-index adds are safe
+        self._data[:, rows] += stacked.reshape(len(keys), 3, -1).transpose(1, 0, 2)
+    
+    def labels(self, dimension: str) -> np.ndarray:
+        if self._label_arrays is None:
+            self._label_arrays = {
+                name: np.array(values, dtype=str) for name, values in self._labels.items()
+            }
+        return self._label_arrays[dimension]
+    
+    def select(self, period: Optional[str], port_id: Optional[str], route_id: Optional[str]) -> np.ndarray:
+        mask = np.ones(len(self.index), dtype=bool)
+        for dimension, value in zip(ROLLUP_DIMENSIONS, (period, port_id, route_id)):
+            if value is not None:
+                mask &= self.labels(dimension) == value
+        return np.flatnonzero(mask)
+    
+    def totals(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        return self.counts[rows].sum(axis=0), self.sums[rows].sum(axis=0), self.sums_sq[rows].sum(axis=0)
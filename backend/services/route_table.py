@@ -0,0 +1,306 @@
+import contextlib
+import json
+import os
+import numpy as np
+from typing import List, Dict, Any, Optional, Set
+from models.maritime import Port, Route, PortUpdate
+from services.calculations import MaritimeCalculator
+from services.risk_analyzer import RiskAnalyzer
+from services.scenarios import ScenarioEngine, RoutePortfolio
+from services.snapshot import FileLock
+
+class RouteAnalysisTable:
+    """
+    Materialized route analyses kept current incrementally.
+    
+    A port -> routes dependency index means a port update only recomputes
+    the routes that touch that port, and every mutation returns a change set
+    describing the rows that actually changed.
+    
+    With a path, the routes are kept in a versioned JSON file shared by all
+    uvicorn workers. Edits are made under a file lock on top of the latest
+    version, and every read first syncs this worker's rows to that version,
+    recomputing only the routes another worker changed.
+    """
+    
+    def __init__(self, calculator: MaritimeCalculator, risk_analyzer: RiskAnalyzer,
+                 path: Optional[str] = None):
+        self.calculator = calculator
+        self.risk_analyzer = risk_analyzer
+        self.engine = ScenarioEngine(calculator, risk_analyzer)
+        self.path = path
+        self.version = 0  # Counts edits to the routes
+        self.routes: Dict[str, Route] = {}
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.port_routes: Dict[str, Set[str]] = {}
+        self._stamp = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    
+    def sync(self) -> bool:
+        """
+        Apply the latest shared version of the routes if this worker is
+        behind
+        """
+        if self.path is None:
+            return False
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return False
+        
+        # The file is replaced rather than rewritten, so an unchanged inode
+        # means no other worker has edited the table
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp == self._stamp:
+            return False
+        with open(self.path) as f:
+            shared = json.load(f)
+        self._stamp = stamp
+        if shared['version'] == self.version:
+            return False
+        
+        routes = [Route.model_validate(route) for route in shared['routes']]
+        shared_ids = {route.id for route in routes}
+        self._remove([route_id for route_id in self.routes if route_id not in shared_ids])
+        changed = [route for route in routes if self.routes.get(route.id) != route]
+        if changed:
+            self._upsert(changed)
+        self.version = shared['version']
+        return True
+    
+    def current_routes(self) -> List[Route]:
+        """
+        Get the routes of the latest shared version
+        """
+        self.sync()
+        return list(self.routes.values())
+    
+    def analyze_route(self, route: Route) -> Dict[str, Any]:
+        """
+        Analyze a single route for cost optimization and risk assessment
+        """
+        return self.analyze_routes([route])[0]
+    
+    def analyze_routes(self, routes: List[Route]) -> List[Dict[str, Any]]:
+        """
+        Analyze routes in one pass of the vectorized route kernel, the same
+        computation that backs scenarios and columnar exports
+        """
+        if not routes:
+            return []
+        
+        columns = self.analyze_columns(routes)
+        base_cost = columns["base_cost"].tolist()
+        risk_cost = columns["risk_cost"].tolist()
+        p95_cost = columns["p95_cost"].tolist()
+        savings = columns["savings"].tolist()
+        recommendation = columns["recommendation"].tolist()
+        
+        return [
+            {
+                "id": route.id,
+                "name": route.name,
+                "base_cost": base_cost[i],
+                "risk_cost": risk_cost[i],
+                "p95_cost": p95_cost[i],
+                "expected_margin": route.expected_margin,
+                "disruption_probability": route.disruption_probability,
+                "recommendation": recommendation[i],
+                "savings": savings[i],
+                "estimated_days": route.estimated_days
+            }
+            for i, route in enumerate(routes)
+        ]
+    
+    def analyze_columns(self, routes: List[Route]) -> Dict[str, np.ndarray]:
+        """
+        Route analyses as one array per output column, for columnar export
+        """
+        portfolio = RoutePortfolio(routes)
+        analysis = self.engine.analyze(portfolio)
+        
+        return {
+            "id": np.array(portfolio.ids, dtype=str),
+            "name": np.array(portfolio.names, dtype=str),
+            "base_cost": analysis["base_cost"],
+            "risk_cost": analysis["risk_cost"],
+            "p95_cost": analysis["p95_cost"],
+            "expected_margin": portfolio.expected_margin,
+            "disruption_probability": portfolio.disruption_probability,
+            "recommendation": analysis["recommendation"],
+            "savings": analysis["savings"],
+            "estimated_days": portfolio.estimated_days
+        }
+    
+    def upsert_routes(self, routes: List[Route]) -> Dict[str, Any]:
+        """
+        Add or replace routes, recomputing only those rows
+        """
+        with self._edit():
+            added, updated = self._upsert(routes)
+            return self._commit(added=added, updated=updated)
+    
+    def _upsert(self, routes: List[Route]):
+        added_ids, updated_ids = [], []
+        for route in routes:
+            existing = self.routes.get(route.id)
+            if existing is not None:
+                self._unindex(existing)
+            self.routes[route.id] = route
+            self._index(route)
+            
+            if route.id in self.rows:
+                updated_ids.append(route.id)
+            elif route.id not in added_ids:
+                added_ids.append(route.id)
+        
+        added = self.analyze_routes([self.routes[route_id] for route_id in added_ids])
+        for row in added:
+            self.rows[row["id"]] = row
+        updated = self._recompute(list(dict.fromkeys(updated_ids)))
+        
+        return added, updated
+    
+    def remove_routes(self, route_ids: List[str]) -> Dict[str, Any]:
+        """
+        Drop routes from the table
+        """
+        with self._edit():
+            return self._commit(removed=self._remove(route_ids))
+    
+    def _remove(self, route_ids: List[str]) -> List[str]:
+        removed = []
+        for route_id in route_ids:
+            route = self.routes.pop(route_id, None)
+            if route is None:
+                continue
+            self._unindex(route)
+            del self.rows[route_id]
+            removed.append(route_id)
+        
+        return removed
+    
+    def update_port(self, port_id: str, update: PortUpdate) -> Dict[str, Any]:
+        """
+        Apply a port update and recompute only the routes that depend on it
+        """
+        with self._edit():
+            return self._update_port(port_id, update)
+    
+    def _update_port(self, port_id: str, update: PortUpdate) -> Dict[str, Any]:
+        if port_id not in self.port_routes:
+            raise KeyError(f"Port {port_id} is not on any route in the table")
+        
+        fields = update.model_dump(exclude_unset=True)
+        route_ids = sorted(self.port_routes[port_id])
+        
+        # Every updated port is validated before any route is replaced, so an
+        # invalid update leaves the table untouched
+        updated_routes = {}
+        for route_id in route_ids:
+            route = self.routes[route_id]
+            changes = {}
+            if route.origin_port.id == port_id:
+                changes['origin_port'] = Port.model_validate({**route.origin_port.model_dump(), **fields})
+            if route.destination_port.id == port_id:
+                changes['destination_port'] = Port.model_validate({**route.destination_port.model_dump(), **fields})
+            updated_routes[route_id] = route.model_copy(update=changes)
+        self.routes.update(updated_routes)
+        
+        return self._commit(updated=self._recompute(route_ids))
+    
+    def recompute_all(self) -> Dict[str, Any]:
+        """
+        Recompute every row, e.g. after model parameters change. The routes
+        are unchanged, so the version is kept.
+        """
+        return self._change_set(updated=self._recompute(list(self.routes)))
+    
+    def get_rows(self, route_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Get materialized rows, optionally restricted to some routes
+        """
+        self.sync()
+        if route_ids is None:
+            return list(self.rows.values())
+        return [self.rows[route_id] for route_id in route_ids if route_id in self.rows]
+    
+    def _recompute(self, route_ids: List[str]) -> List[Dict[str, Any]]:
+        """
+        Recompute rows in one batch, returning the changes of those that
+        differ
+        """
+        updated = []
+        new_rows = self.analyze_routes([self.routes[route_id] for route_id in route_ids])
+        for route_id, new_row in zip(route_ids, new_rows):
+            old_row = self.rows.get(route_id, {})
+            self.rows[route_id] = new_row
+            
+            changes = {
+                field: {"old": old_row.get(field), "new": value}
+                for field, value in new_row.items()
+                if old_row.get(field) != value
+            }
+            if changes:
+                updated.append({"id": route_id, "changes": changes})
+        
+        return updated
+    
+    def _index(self, route: Route):
+        for port_id in {route.origin_port.id, route.destination_port.id}:
+            self.port_routes.setdefault(port_id, set()).add(route.id)
+    
+    def _unindex(self, route: Route):
+        for port_id in {route.origin_port.id, route.destination_port.id}:
+            dependents = self.port_routes.get(port_id)
+            if dependents is None:
+                continue
+            dependents.discard(route.id)
+            if not dependents:
+                del self.port_routes[port_id]
+    
+    @contextlib.contextmanager
+    def _edit(self):
+        """
+        Serialize edits across workers and apply them to the latest version
+        """
+        if self.path is None:
+            yield
+            return
+        
+        with FileLock(self.path + '.lock'):
+            self.sync()
+            yield
+    
+    def _commit(self, added=None, updated=None, removed=None) -> Dict[str, Any]:
+        """
+        Count an edit that changed rows and share the new version
+        """
+        if added or updated or removed:
+            self.version += 1
+            if self.path is not None:
+                self._write()
+        return self._change_set(added, updated, removed)
+    
+    def _write(self):
+        shared = {
+            'version': self.version,
+            'routes': [route.model_dump(mode='json') for route in self.routes.values()]
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(shared, f)
+        os.replace(tmp_path, self.path)
+        stat = os.stat(self.path)
+        self._stamp = (stat.st_ino, stat.st_mtime_ns)
+    
+    def _change_set(self, added=None, updated=None, removed=None) -> Dict[str, Any]:
+        added, updated, removed = added or [], updated or [], removed or []
+        
+        return {
+            "version": self.version,
+            "added": added,
+            "updated": updated,
+            "removed": removed
+        }
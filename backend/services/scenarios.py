@@ -0,0 +1,200 @@
+import numpy as np
+from typing import List, Dict, Any, Optional
+from models.maritime import Route, ScenarioParameters, ScenarioTotals, ScenarioResult
+from services.calculations import MaritimeCalculator, round_cents
+from services.risk_analyzer import RiskAnalyzer
+
+# Parameters that are plain scalars on the calculator or the risk analyzer
+CALCULATOR_PARAMETERS = ['distance_cost_per_nm', 'uncertainty_buffer_rate', 'current_cost_uplift']
+RISK_PARAMETERS = [
+    'corruption_risk_weight', 'weather_risk_weight', 'operational_risk_weight',
+    'base_risk_cost', 'risk_threshold_medium', 'risk_threshold_high'
+]
+SCALAR_PARAMETERS = CALCULATOR_PARAMETERS + RISK_PARAMETERS
+
+RECOMMENDATIONS = np.array(['use', 'caution', 'avoid'])
+
+class RoutePortfolio:
+    """
+    Column arrays for a set of routes, extracted once and reused by every
+    vectorized evaluation
+    """
+    
+    def __init__(self, routes: List[Route]):
+        self.routes = routes
+        self.ids = [route.id for route in routes]
+        self.names = [route.name for route in routes]
+        self.distance = np.array([route.distance for route in routes], dtype=float)
+        self.estimated_days = np.array([route.estimated_days for route in routes], dtype=float)
+        self.expected_margin = np.array([route.expected_margin for route in routes], dtype=float)
+        self.disruption_probability = np.array([route.disruption_probability for route in routes], dtype=float)
+        self.corruption_index = np.array([
+            route.destination_port.corruption_index or 0.0 for route in routes
+        ], dtype=float)
+        self.reliability_score = np.array([
+            route.destination_port.reliability_score or 0.0 for route in routes
+        ], dtype=float)
+        
+        regions = [route.destination_port.region for route in routes]
+        self.regions, self.region_index = np.unique(np.array(regions, dtype=object), return_inverse=True)
+        self.region_index = self.region_index.reshape(-1)
+        
+        port_ids = [route.destination_port.id for route in routes]
+        self.port_ids, first_route, self.port_index = np.unique(
+            np.array(port_ids, dtype=str), return_index=True, return_inverse=True
+        )
+        self.port_index = self.port_index.reshape(-1)
+        self.port_regions = np.array(regions, dtype=object)[first_route]
+    
+    def __len__(self) -> int:
+        return len(self.routes)
+
+class ScenarioEngine:
+    """
+    Evaluates many model parameter sets against a route portfolio in one
+    broadcasted scenarios x routes pass
+    """
+    
+    def __init__(self, calculator: MaritimeCalculator, risk_analyzer: RiskAnalyzer):
+        self.calculator = calculator
+        self.risk_analyzer = risk_analyzer
+        self.max_cells_per_chunk = 2_000_000  # Bounds scenario x route intermediate arrays
+    
+    def baseline_parameters(self) -> Dict[str, Any]:
+        """
+        Get the parameters currently used by the live calculator and analyzer
+        """
+        parameters = {name: getattr(self.calculator, name) for name in CALCULATOR_PARAMETERS}
+        parameters.update({name: getattr(self.risk_analyzer, name) for name in RISK_PARAMETERS})
+        parameters['weather_risk_multipliers'] = dict(self.risk_analyzer.weather_risk_multipliers)
+        return parameters
+    
+    def analyze(self, portfolio: RoutePortfolio, parameters: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+        """
+        Run the route analysis for a single parameter set, returning one
+        array per output column
+        """
+        parameters = parameters or self.baseline_parameters()
+        results = self._evaluate(portfolio, [parameters])
+        return {name: values[0] for name, values in results.items()}
+    
+    def evaluate(self, portfolio: RoutePortfolio, scenarios: List[ScenarioParameters]) -> Dict[str, Any]:
+        """
+        Evaluate scenarios against the portfolio and compare each with the
+        live baseline
+        """
+        baseline_parameters = self.baseline_parameters()
+        baseline = self.analyze(portfolio, baseline_parameters)
+        baseline_totals = self._totals(baseline)
+        
+        scenario_parameters = [
+            self._resolve_parameters(baseline_parameters, scenario) for scenario in scenarios
+        ]
+        
+        # Chunk the scenario axis so intermediate arrays stay bounded
+        chunk_size = max(1, self.max_cells_per_chunk // max(1, len(portfolio)))
+        scenario_results = []
+        for start in range(0, len(scenarios), chunk_size):
+            chunk = scenario_parameters[start:start + chunk_size]
+            results = self._evaluate(portfolio, chunk)
+            
+            for offset in range(len(chunk)):
+                scenario = scenarios[start + offset]
+                row = {name: values[offset] for name, values in results.items()}
+                totals = self._totals(row)
+                
+                changed = np.nonzero(row['recommendation'] != baseline['recommendation'])[0]
+                scenario_results.append(ScenarioResult(
+                    name=scenario.name or f"scenario_{start + offset + 1}",
+                    totals=totals,
+                    total_deltas={
+                        metric: round(getattr(totals, metric) - getattr(baseline_totals, metric), 2)
+                        for metric in ['base_cost', 'risk_cost', 'p95_cost', 'savings']
+                    },
+                    route_deltas={
+                        metric: np.round(row[metric] - baseline[metric], 2).tolist()
+                        for metric in ['base_cost', 'risk_cost', 'p95_cost', 'savings']
+                    },
+                    recommendation_changes={
+                        portfolio.ids[i]: str(row['recommendation'][i]) for i in changed
+                    }
+                ))
+        
+        return {
+            'route_ids': portfolio.ids,
+            'baseline': {
+                'parameters': baseline_parameters,
+                'totals': baseline_totals
+            },
+            'scenarios': scenario_results
+        }
+    
+    def _resolve_parameters(self, baseline: Dict[str, Any], scenario: ScenarioParameters) -> Dict[str, Any]:
+        parameters = dict(baseline)
+        for name in SCALAR_PARAMETERS:
+            value = getattr(scenario, name)
+            if value is not None:
+                parameters[name] = value
+        if scenario.weather_risk_multipliers:
+            parameters['weather_risk_multipliers'] = {
+                **baseline['weather_risk_multipliers'],
+                **scenario.weather_risk_multipliers
+            }
+        return parameters
+    
+    def _evaluate(self, portfolio: RoutePortfolio, parameter_sets: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """
+        The route analysis kernel: the calculator and analyzer formulas
+        broadcast over a (scenarios, routes) grid. Route analyses in every
+        format come from here. As in the scalar formulas, only the outputs
+        are rounded, and the reported risk and p95 costs feed the outputs
+        derived from them.
+        """
+        def column(name: str) -> np.ndarray:
+            return np.array([parameters[name] for parameters in parameter_sets], dtype=float)[:, None]
+        
+        # Port cost does not depend on any scenario parameter
+        port_cost = self.calculator.calculate_port_cost(portfolio.corruption_index, portfolio.reliability_score)
+        base_cost = portfolio.distance * column('distance_cost_per_nm') + port_cost
+        
+        base_risk_cost = column('base_risk_cost')
+        corruption_risk = base_risk_cost * self.risk_analyzer.calculate_corruption_multiplier(portfolio.corruption_index)
+        weather_multipliers = np.array([
+            [parameters['weather_risk_multipliers'].get(region, 1.0) for region in portfolio.regions]
+            for parameters in parameter_sets
+        ], dtype=float).reshape(len(parameter_sets), len(portfolio.regions))
+        weather_risk = base_risk_cost * weather_multipliers[:, portfolio.region_index]
+        operational_risk = self.risk_analyzer.calculate_distance_time_risk(portfolio.distance, portfolio.estimated_days)
+        risk_cost = round_cents(
+            corruption_risk * column('corruption_risk_weight') +
+            weather_risk * column('weather_risk_weight') +
+            operational_risk * column('operational_risk_weight')
+        )
+        
+        p95_cost = round_cents(base_cost + risk_cost + base_cost * column('uncertainty_buffer_rate'))
+        savings = round_cents(p95_cost * (1 + column('current_cost_uplift')) - p95_cost)
+        
+        recommendation_level = (
+            (risk_cost > column('risk_threshold_medium')).astype(int) +
+            (risk_cost > column('risk_threshold_high')).astype(int)
+        )
+        
+        return {
+            'base_cost': round_cents(base_cost),
+            'risk_cost': risk_cost,
+            'p95_cost': p95_cost,
+            'savings': savings,
+            'recommendation': RECOMMENDATIONS[recommendation_level]
+        }
+    
+    def _totals(self, row: Dict[str, np.ndarray]) -> ScenarioTotals:
+        recommendation = row['recommendation']
+        return ScenarioTotals(
+            base_cost=round(float(row['base_cost'].sum()), 2),
+            risk_cost=round(float(row['risk_cost'].sum()), 2),
+            p95_cost=round(float(row['p95_cost'].sum()), 2),
+            savings=round(float(row['savings'].sum()), 2),
+            routes_use=int((recommendation == 'use').sum()),
+            routes_caution=int((recommendation == 'caution').sum()),
+            routes_avoid=int((recommendation == 'avoid').sum())
+        )
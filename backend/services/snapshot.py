@@ -0,0 +1,408 @@
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple, Callable
+import numpy as np
+from models.maritime import Port, Vessel
+
+SNAPSHOT_MAGIC = b"OTSNAP01"
+# Bumped whenever a table's column layout changes. Snapshots written with
+# another schema are never attached; they are replaced on the next publish.
+SNAPSHOT_SCHEMA_VERSION = 3
+CURRENT_POINTER = "CURRENT"
+LOCK_FILE = ".lock"
+
+# Column layout of every table stored in a snapshot. String columns are kept as
+# fixed-width UTF-8 byte arrays, numeric columns as float64 with NaN for None.
+# History strings are read as whole columns, so they are stored as fixed-width
+# unicode arrays that need no decoding.
+PORT_STRING_COLUMNS = ['id', 'name', 'country', 'region']
+PORT_NUMERIC_COLUMNS = ['lat', 'lng', 'corruption_index', 'reliability_score', 'average_delay_days']
+VESSEL_STRING_COLUMNS = ['id', 'name']
+VESSEL_NUMERIC_COLUMNS = [
+    'tonnage', 'discharge', 'bcmea_rate', 'dock_cost',
+    'bcmea_assurance', 'under_holding', 'grand_total'
+]
+HISTORY_STRING_COLUMNS = ['date', 'port_id', 'route_id']
+HISTORY_NUMERIC_COLUMNS = [
+    'total_cost', 'tonnage', 'margin', 'disruption_probability', 'risk_score',
+    'realized_risk_cost'
+]
+
+class DataSnapshot:
+    """
+    Read-only view over one published snapshot file.
+    
+    Columns are numpy arrays backed directly by the memory map, so every
+    worker attached to the same version shares the same physical pages.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        if self._mmap[:8] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not an Ocean Treasury snapshot")
+        
+        header_length = struct.unpack_from('<Q', self._mmap, 8)[0]
+        self.header = json.loads(bytes(self._mmap[16:16 + header_length]).decode('utf-8'))
+        self.version = self.header['version']
+        self.created_at = self.header['created_at']
+        self.schema_version = self.header.get('schema_version', 1)
+        self.source_digest = self.header.get('source_digest')
+        # Bytes of the shipment log already folded into the history table
+        self.log_offset = self.header.get('log_offset', 0)
+        
+        self.tables: Dict[str, Dict[str, np.ndarray]] = {}
+        for table_name, table in self.header['tables'].items():
+            self.tables[table_name] = {
+                column_name: np.frombuffer(
+                    self._mmap,
+                    dtype=np.dtype(column['dtype']),
+                    count=table['rows'],
+                    offset=column['offset']
+                ) if table['rows'] else np.empty(0, dtype=np.dtype(column['dtype']))
+                for column_name, column in table['columns'].items()
+            }
+    
+    @property
+    def size_bytes(self) -> int:
+        return len(self._mmap)
+    
+    def row_count(self, table: str) -> int:
+        return self.header['tables'][table]['rows']
+    
+    def column(self, table: str, name: str) -> np.ndarray:
+        """
+        Zero-copy column view
+        """
+        return self.tables[table][name]
+    
+    def ports(self) -> List[Port]:
+        """
+        Materialize the port catalog
+        """
+        return [self.port(i) for i in range(self.row_count('ports'))]
+    
+    def port(self, row: int) -> Port:
+        """
+        Materialize a single port row
+        """
+        columns = self.tables['ports']
+        return Port(
+            id=_decode(columns['id'][row]),
+            name=_decode(columns['name'][row]),
+            country=_decode(columns['country'][row]),
+            region=_decode(columns['region'][row]),
+            coordinates={"lat": float(columns['lat'][row]), "lng": float(columns['lng'][row])},
+            corruption_index=_optional(columns['corruption_index'][row]),
+            reliability_score=_optional(columns['reliability_score'][row]),
+            average_delay_days=_optional(columns['average_delay_days'][row])
+        )
+    
+    def vessels(self) -> List[Vessel]:
+        """
+        Materialize the vessel catalog
+        """
+        return [self.vessel(i) for i in range(self.row_count('vessels'))]
+    
+    def vessel(self, row: int) -> Vessel:
+        """
+        Materialize a single vessel row
+        """
+        columns = self.tables['vessels']
+        record = {name: _decode(columns[name][row]) for name in VESSEL_STRING_COLUMNS}
+        record.update({name: float(columns[name][row]) for name in VESSEL_NUMERIC_COLUMNS})
+        return Vessel(**record)
+    
+    def history_records(self) -> List[Dict]:
+        """
+        Materialize shipment history as records
+        """
+        columns = self.tables['history']
+        records = []
+        for i in range(self.row_count('history')):
+            record = {name: str(columns[name][i]) for name in HISTORY_STRING_COLUMNS}
+            for name in HISTORY_NUMERIC_COLUMNS:
+                value = _optional(columns[name][i])
+                if value is not None:
+                    record[name] = value
+            records.append(record)
+        return records
+
+class SnapshotStore:
+    """
+    Publishes reference data once as immutable, versioned snapshot files and
+    lets every uvicorn worker attach to the latest version.
+    
+    Publishing writes a new ``snapshot-<version>.bin`` and then atomically
+    replaces the ``CURRENT`` pointer, so readers never see a partial file.
+    Attached workers notice the new pointer on their next read and swap their
+    reference in a single assignment. Each snapshot records its schema version
+    and a digest of the source data, so a snapshot left behind by another
+    build or other reference data is replaced rather than reused.
+    
+    Ingested shipments are folded into the history table as new versions of
+    the same reference data, so workers share one copy of them as well.
+    """
+    
+    def __init__(self, directory: str, keep_versions: int = 2):
+        self.directory = directory
+        self.keep_versions = keep_versions
+        self._current: Optional[DataSnapshot] = None
+        self._pointer_stamp = None
+        os.makedirs(directory, exist_ok=True)
+    
+    def current(self) -> Optional[DataSnapshot]:
+        """
+        Get the latest published snapshot, re-attaching if a newer one exists
+        """
+        pointer_path = os.path.join(self.directory, CURRENT_POINTER)
+        try:
+            stat = os.stat(pointer_path)
+        except FileNotFoundError:
+            return None
+        
+        # The pointer is replaced rather than rewritten, so a new inode means
+        # a new version was published
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if self._current is None or stamp != self._pointer_stamp:
+            version = self._read_pointer()
+            if self._current is None or version != self._current.version:
+                snapshot = DataSnapshot(self._snapshot_path(version))
+                if snapshot.schema_version != SNAPSHOT_SCHEMA_VERSION:
+                    # Written by another build; unusable until republished
+                    return None
+                self._current = snapshot
+            self._pointer_stamp = stamp
+        
+        return self._current
+    
+    def publish(self, ports: List[Port], vessels: List[Vessel], history: List[Dict]) -> int:
+        """
+        Publish a new snapshot version and return its number
+        """
+        digest = source_digest(ports, vessels, history)
+        with self._lock():
+            return self._publish(ports, vessels, history, digest)
+    
+    def publish_if_changed(self, ports: List[Port], vessels: List[Vessel], history: List[Dict]) -> int:
+        """
+        Publish unless the current snapshot already holds this data with the
+        current schema, e.g. because another worker published it first
+        """
+        digest = source_digest(ports, vessels, history)
+        with self._lock():
+            version = self._read_pointer()
+            header = self._read_header(version) if version is not None else None
+            if (header is not None and header.get('schema_version') == SNAPSHOT_SCHEMA_VERSION
+                    and header.get('source_digest') == digest):
+                return version
+            return self._publish(ports, vessels, history, digest)
+    
+    def fold_history(self, read_log: Callable[[int], Tuple[Dict[str, np.ndarray], int]]) -> Optional[int]:
+        """
+        Append the shipment log records after the current snapshot's log
+        offset to its history as a new version, returning the version that
+        holds them. read_log(offset) returns the complete records after an
+        offset as column arrays, with the offset to resume from.
+        """
+        with self._lock():
+            snapshot = self.current()
+            if snapshot is None:
+                return None
+            
+            # Another worker may have folded the same records while we waited
+            columns, offset = read_log(snapshot.log_offset)
+            if not columns or offset <= snapshot.log_offset:
+                return snapshot.version
+            
+            history = {}
+            for name, column in snapshot.tables['history'].items():
+                history[name] = np.concatenate([column, columns[name]])
+            tables = {
+                'ports': snapshot.tables['ports'],
+                'vessels': snapshot.tables['vessels'],
+                'history': history
+            }
+            return self._commit(tables, snapshot.source_digest, offset)
+    
+    def _publish(self, ports: List[Port], vessels: List[Vessel], history: List[Dict], digest: str) -> int:
+        tables = {
+            'ports': _port_columns(ports),
+            'vessels': _record_columns(
+                [vessel.model_dump() if hasattr(vessel, 'model_dump') else vessel for vessel in vessels],
+                VESSEL_STRING_COLUMNS,
+                VESSEL_NUMERIC_COLUMNS
+            ),
+            'history': _record_columns(history, HISTORY_STRING_COLUMNS, HISTORY_NUMERIC_COLUMNS, unicode=True)
+        }
+        return self._commit(tables, digest, 0)
+    
+    def _commit(self, tables: Dict[str, Dict[str, np.ndarray]], digest: str, log_offset: int) -> int:
+        version = (self._read_pointer() or 0) + 1
+        self._write_snapshot(version, tables, digest, log_offset)
+        self._write_pointer(version)
+        self._remove_old_versions(version)
+        return version
+    
+    def _read_header(self, version: int) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._snapshot_path(version), 'rb') as handle:
+                if handle.read(8) != SNAPSHOT_MAGIC:
+                    return None
+                header_length = struct.unpack('<Q', handle.read(8))[0]
+                return json.loads(handle.read(header_length).decode('utf-8'))
+        except (FileNotFoundError, struct.error, ValueError):
+            return None
+    
+    def _write_snapshot(self, version: int, tables: Dict[str, Dict[str, np.ndarray]], digest: str,
+                        log_offset: int):
+        header = {
+            'version': version,
+            'schema_version': SNAPSHOT_SCHEMA_VERSION,
+            'source_digest': digest,
+            'log_offset': log_offset,
+            'created_at': datetime.now().isoformat(),
+            'tables': {}
+        }
+        
+        # Lay out column buffers after the header, each aligned to 8 bytes.
+        # The header records the offsets, so repeat until its size is stable.
+        data_start = _align(16 + len(json.dumps(header).encode('utf-8')))
+        while True:
+            offset = data_start
+            blobs = []
+            for table_name, columns in tables.items():
+                rows = len(next(iter(columns.values()))) if columns else 0
+                table_header = {'rows': rows, 'columns': {}}
+                for column_name, array in columns.items():
+                    table_header['columns'][column_name] = {
+                        'dtype': array.dtype.str,
+                        'offset': offset
+                    }
+                    blobs.append((offset, array.tobytes()))
+                    offset = _align(offset + array.nbytes)
+                header['tables'][table_name] = table_header
+            header_bytes = json.dumps(header).encode('utf-8')
+            if 16 + len(header_bytes) <= data_start:
+                break
+            data_start = _align(16 + len(header_bytes) + 64)
+        
+        path = self._snapshot_path(version)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as handle:
+            handle.write(SNAPSHOT_MAGIC)
+            handle.write(struct.pack('<Q', len(header_bytes)))
+            handle.write(header_bytes)
+            for blob_offset, data in blobs:
+                handle.seek(blob_offset)
+                handle.write(data)
+            handle.truncate(offset)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(temp_path, path)
+    
+    def _read_pointer(self) -> Optional[int]:
+        try:
+            with open(os.path.join(self.directory, CURRENT_POINTER)) as handle:
+                return int(handle.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+    
+    def _write_pointer(self, version: int):
+        pointer_path = os.path.join(self.directory, CURRENT_POINTER)
+        with open(pointer_path + '.tmp', 'w') as handle:
+            handle.write(str(version))
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(pointer_path + '.tmp', pointer_path)
+    
+    def _remove_old_versions(self, latest_version: int):
+        # Unlinking is safe for workers still mapped to an old version; the
+        # pages stay valid until their last reference is dropped.
+        for name in os.listdir(self.directory):
+            if not (name.startswith('snapshot-') and name.endswith('.bin')):
+                continue
+            version = int(name[len('snapshot-'):-len('.bin')])
+            if version <= latest_version - self.keep_versions:
+                os.unlink(os.path.join(self.directory, name))
+    
+    def _snapshot_path(self, version: int) -> str:
+        return os.path.join(self.directory, f"snapshot-{version:08d}.bin")
+    
+    def _lock(self):
+        return FileLock(os.path.join(self.directory, LOCK_FILE))
+
+class FileLock:
+    """
+    Exclusive inter-process lock held for the duration of a with block
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+    
+    def __enter__(self):
+        self._handle = open(self.path, 'a')
+        fcntl.flock(self._handle.fileno(), fcntl.LOCK_EX)
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        fcntl.flock(self._handle.fileno(), fcntl.LOCK_UN)
+        self._handle.close()
+        self._handle = None
+
+def source_digest(ports: List[Port], vessels: List[Vessel], history: List[Dict]) -> str:
+    """
+    SHA-256 of the reference data a snapshot is built from
+    """
+    source = {
+        'ports': [port.model_dump() for port in ports],
+        'vessels': [vessel.model_dump() if hasattr(vessel, 'model_dump') else vessel for vessel in vessels],
+        'history': history
+    }
+    return hashlib.sha256(json.dumps(source, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _port_columns(ports: List[Port]) -> Dict[str, np.ndarray]:
+    records = []
+    for port in ports:
+        record = port.model_dump()
+        record['lat'] = record['coordinates']['lat']
+        record['lng'] = record['coordinates']['lng']
+        records.append(record)
+    return _record_columns(records, PORT_STRING_COLUMNS, PORT_NUMERIC_COLUMNS)
+
+def _record_columns(records: List[Dict[str, Any]], string_columns: List[str], numeric_columns: List[str],
+                    unicode: bool = False) -> Dict[str, np.ndarray]:
+    columns = {}
+    for name in string_columns:
+        if unicode:
+            values = [str(record.get(name, '')) for record in records]
+            width = max((len(value) for value in values), default=1) or 1
+            columns[name] = np.array(values, dtype=f'<U{width}')
+            continue
+        encoded = [str(record.get(name, '')).encode('utf-8') for record in records]
+        width = max((len(value) for value in encoded), default=1) or 1
+        columns[name] = np.array(encoded, dtype=f'S{width}')
+    for name in numeric_columns:
+        values = [record.get(name) for record in records]
+        columns[name] = np.array(
+            [np.nan if value is None else float(value) for value in values],
+            dtype='<f8'
+        )
+    return columns
+
+def _align(offset: int, alignment: int = 8) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+def _decode(value: bytes) -> str:
+    return value.decode('utf-8')
+
+def _optional(value: float) -> Optional[float]:
+    return None if np.isnan(value) else float(value)
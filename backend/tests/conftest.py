@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+
+# Services import each other relative to the backend directory, as under uvicorn
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the app's shared snapshot and shipment log out of the real directory
+os.environ.setdefault("OCEAN_TREASURY_SNAPSHOT_DIR", tempfile.mkdtemp(prefix="ocean-treasury-tests-"))
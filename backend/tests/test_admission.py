@@ -0,0 +1,81 @@
+import asyncio
+import httpx
+import pytest
+from services.admission import (
+    AdmissionController, AdmissionMiddleware, AdmissionRejected, EndpointPolicy, STANDARD, BATCH
+)
+
+def controller_with(max_concurrent=1):
+    standard = EndpointPolicy("/api/standard", STANDARD, max_concurrent)
+    batch = EndpointPolicy("/api/batch", BATCH, max_concurrent)
+    controller = AdmissionController([standard, batch], standard, max_cost_in_flight=100)
+    return controller, standard, batch
+
+def test_queued_requests_are_admitted_in_priority_order():
+    async def scenario():
+        controller, standard, batch = controller_with()
+        blocker = EndpointPolicy("/api/blocker", STANDARD, 1)
+        await controller.acquire(blocker, 100)  # uses the whole cost budget
+        
+        admitted = []
+        async def request(policy, name):
+            await controller.acquire(policy, 10)
+            admitted.append(name)
+        
+        waiting = [asyncio.ensure_future(request(batch, "batch")), asyncio.ensure_future(request(standard, "standard"))]
+        await asyncio.sleep(0)
+        assert controller.get_stats()['waiting'] == {'standard': 1, 'batch': 1}
+        
+        controller.release(blocker, 100, 0.01)
+        await asyncio.gather(*waiting)
+        return admitted, controller
+    
+    admitted, controller = asyncio.run(scenario())
+    assert admitted == ["standard", "batch"]
+    assert controller.counters['queued'] == 2
+    assert controller.cost_in_flight == 20
+
+def test_full_queue_is_rejected_with_429():
+    async def scenario():
+        controller, standard, _ = controller_with()
+        controller.max_queued[STANDARD] = 1
+        await controller.acquire(standard, 10)
+        queued = asyncio.ensure_future(controller.acquire(standard, 10))
+        await asyncio.sleep(0)
+        
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(standard, 10)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        return rejected.value, controller
+    
+    rejected, controller = asyncio.run(scenario())
+    assert rejected.status_code == 429
+    assert rejected.retry_after >= 1
+    assert controller.counters['rejected_429'] == 1
+    assert not controller.waiters
+
+def test_request_waiting_too_long_gets_503_with_retry_after():
+    async def slow_app(scope, receive, send):
+        await receive()
+        await asyncio.sleep(0.3)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+    
+    async def scenario():
+        controller, _, _ = controller_with()
+        controller.max_wait_seconds[STANDARD] = 0.05
+        app = AdmissionMiddleware(slow_app, controller)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.ensure_future(client.post("/api/standard", json={"id": "route_1"}))
+            await asyncio.sleep(0.05)
+            second = await client.post("/api/standard", json={"id": "route_2"})
+            return await first, second, controller
+    
+    first, second, controller = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert second.status_code == 503
+    assert int(second.headers["retry-after"]) >= 1
+    assert controller.counters['rejected_503'] == 1
+    assert controller.cost_in_flight == 0
+    assert not controller.waiters
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from models.maritime import Port, Coordinates, Vessel, GangSchedule
+from services.berth_simulator import BerthSimulator, simulate_port
+from services.calculations import MaritimeCalculator
+from services.gang_optimizer import GangScheduleOptimizer
+
+PORT = Port(
+    id="port_1", name="Port", country="Country", region="Region",
+    coordinates=Coordinates(lat=0.0, lng=0.0), average_delay_days=2.0
+)
+VESSEL = Vessel(
+    id="vessel_1", name="Vessel", tonnage=20520, discharge=5, bcmea_rate=3.27, dock_cost=0.25,
+    bcmea_assurance=0.15, under_holding=0.08, grand_total=3.75
+)
+
+def test_vessel_discharge_days_drive_service_time():
+    config = BerthSimulator().build_config(PORT, [VESSEL], arrivals_per_day=0.1, horizon_days=30)
+    assert config['vessel_discharge_days'].tolist() == [5.0]
+
+def test_gang_schedules_drive_service_time_and_labour():
+    schedules = [
+        GangSchedule(day_type=day_type, shift_time="08:00", number_of_gangs=4, cost_per_gang=1000, total_cost=0)
+        for day_type in ("weekday", "weekend")
+    ]
+    capacity = GangScheduleOptimizer(MaritimeCalculator()).discharge_capacity(schedules)
+    config = BerthSimulator().build_config(
+        PORT, [VESSEL], arrivals_per_day=0.1, horizon_days=30, discharge_capacity=capacity
+    )
+    
+    assert config['vessel_discharge_days'][0] == pytest.approx(20520 / 2000)
+    assert config['vessel_labour_cost'][0] == pytest.approx(42 * 1000)
+
+@pytest.mark.parametrize("overrides", [{"berths": 0}, {"arrivals_per_day": -1.0}, {"disruption_probability": 1.5}])
+def test_invalid_inputs_are_rejected(overrides):
+    arguments = {"arrivals_per_day": 0.1, "horizon_days": 30, **overrides}
+    with pytest.raises(ValueError):
+        BerthSimulator().build_config(PORT, [VESSEL], **arguments)
+
+def test_busy_time_is_clipped_at_the_horizon():
+    # Far more arrivals than one berth can serve keeps it busy past the horizon
+    config = BerthSimulator().build_config(PORT, [VESSEL], arrivals_per_day=2.0, horizon_days=30, berths=1)
+    result = simulate_port(config, np.random.default_rng(0))
+    
+    assert result['turnaround_days'].max() > 30
+    assert 29 < result['busy_days'] <= 30
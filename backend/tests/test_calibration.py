@@ -0,0 +1,119 @@
+import asyncio
+import numpy as np
+import pytest
+from services.calibration import RiskModelRegistry, RiskCalibrator, fit_risk_model
+from services.risk_analyzer import RiskAnalyzer
+
+TRUE_PARAMETERS = {
+    'corruption_risk_weight': 0.5,
+    'weather_risk_weight': 0.2,
+    'operational_risk_weight': 0.3,
+    'base_risk_cost': 6000.0,
+    'weather_risk_multipliers': {'Asia': 1.2, 'Africa': 1.8, 'Europe': 0.9}
+}
+
+def training_data(count=2000, unknown_routes=0, seed=0):
+    rng = np.random.default_rng(seed)
+    regions = np.array(['Asia', 'Asia', 'Africa', 'Europe'] * 5)
+    ports = {
+        'id': np.array([f"port_{i:02d}" for i in range(len(regions))]),
+        'region': regions,
+        'corruption_index': rng.uniform(0, 1, len(regions))
+    }
+    rows = rng.integers(len(regions), size=count)
+    operational_risk = rng.uniform(500, 3000, count)
+    weights = TRUE_PARAMETERS
+    realized = (
+        weights['corruption_risk_weight'] * weights['base_risk_cost'] * (1 + 2 * ports['corruption_index'][rows])
+        + weights['weather_risk_weight'] * weights['base_risk_cost']
+        * np.array([weights['weather_risk_multipliers'][region] for region in regions[rows]])
+        + weights['operational_risk_weight'] * operational_risk
+        + rng.normal(0, 50, count)
+    )
+    # Shipments on routes outside the table carry no operational risk
+    operational_risk[:unknown_routes] = np.nan
+    realized[:unknown_routes] = 1e6
+    history = {'port_id': ports['id'][rows], 'operational_risk': operational_risk, 'realized_risk_cost': realized}
+    return history, ports
+
+def prior_parameters():
+    parameters = RiskAnalyzer().get_model_parameters()
+    parameters['weather_risk_multipliers'] = {'Asia': 1.2, 'Africa': 1.5, 'Europe': 1.0}
+    return parameters
+
+def test_fit_recovers_parameters_net_of_operational_risk():
+    history, ports = training_data(unknown_routes=100)
+    fit = fit_risk_model(history, ports, prior_parameters())
+    fitted = fit['parameters']
+    
+    assert fitted['corruption_risk_weight'] == pytest.approx(0.5, abs=0.01)
+    assert fitted['weather_risk_weight'] == pytest.approx(0.2, abs=0.01)
+    assert fitted['base_risk_cost'] == pytest.approx(6000, rel=0.01)
+    for region in ('Africa', 'Europe'):
+        assert fitted['weather_risk_multipliers'][region] == pytest.approx(
+            TRUE_PARAMETERS['weather_risk_multipliers'][region], abs=0.02
+        )
+    assert fit['metrics']['samples'] + fit['metrics']['holdout_samples'] == 1900
+    assert fit['metrics']['rmse_after'] < fit['metrics']['rmse_before']
+
+def test_fit_is_judged_on_held_out_records():
+    history, ports = training_data()
+    parameters = fit_risk_model(history, ports, prior_parameters())['parameters']
+    
+    # Refitting from the fitted model has nothing left to gain out of sample
+    metrics = fit_risk_model(history, ports, parameters, seed=1)['metrics']
+    assert metrics['rmse_after'] >= metrics['rmse_before'] - 1.0
+
+def test_activated_version_is_applied_by_other_workers_on_sync(tmp_path):
+    registry = RiskModelRegistry(str(tmp_path))
+    changes = []
+    first = RiskCalibrator(RiskAnalyzer(), registry, load_training_data=None)
+    second = RiskCalibrator(RiskAnalyzer(), registry, load_training_data=None, on_change=lambda: changes.append(1))
+    registry.bootstrap(first.risk_analyzer.get_model_parameters())
+    first.sync()
+    second.sync()
+    
+    model = registry.register(TRUE_PARAMETERS)
+    first.activate(model['version'])
+    assert second.risk_analyzer.parameters_version == 1
+    
+    assert second.sync()
+    assert second.risk_analyzer.parameters_version == model['version']
+    assert second.risk_analyzer.get_model_parameters() == TRUE_PARAMETERS
+    assert not second.sync()
+    assert len(changes) == 2
+
+def test_pinned_version_survives_calibration_until_unpinned_and_can_be_rolled_back(tmp_path):
+    analyzer = RiskAnalyzer()
+    analyzer.weather_risk_multipliers = prior_parameters()['weather_risk_multipliers']
+    default_parameters = analyzer.get_model_parameters()
+    
+    async def load_training_data():
+        return training_data()
+    
+    async def scenario():
+        calibrator = RiskCalibrator(analyzer, RiskModelRegistry(str(tmp_path)), load_training_data)
+        calibrator.start()
+        try:
+            calibrator.activate(1, pinned=True)
+            pinned_run = await calibrator.calibrate()
+            pinned_version = analyzer.parameters_version
+            
+            calibrator.unpin()
+            unpinned_run = await calibrator.calibrate()
+            calibrated = analyzer.get_model_parameters()
+            
+            calibrator.activate(1)
+            return pinned_run, pinned_version, unpinned_run, calibrated
+        finally:
+            await calibrator.stop()
+    
+    pinned_run, pinned_version, unpinned_run, calibrated = asyncio.run(scenario())
+    
+    assert pinned_run['accepted'] and "pinned" in pinned_run['reason']
+    assert pinned_version == 1
+    assert unpinned_run['accepted'] and 'reason' not in unpinned_run
+    assert calibrated['base_risk_cost'] == pytest.approx(6000, rel=0.01)
+    # Rolling back restores the default model everywhere
+    assert analyzer.parameters_version == 1
+    assert analyzer.get_model_parameters() == default_parameters
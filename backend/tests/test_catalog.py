@@ -0,0 +1,77 @@
+import asyncio
+import pytest
+from services.catalog import CatalogIndex
+from services.data_processor import DataProcessor
+from services.snapshot import SnapshotStore
+
+def catalog_data(port_count):
+    processor = DataProcessor()
+    template = processor.mock_ports[0]
+    ports = [
+        template.model_copy(update={'id': f"port_{i:04d}", 'region': ('Asia', 'Europe')[i % 2]})
+        for i in range(port_count)
+    ]
+    return ports, processor.mock_vessels, processor.mock_history
+
+def read_pages(index, limit, **filters):
+    rows = index.query_ports(**filters)
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = index.page(rows, cursor, limit)
+        ids += [index.snapshot.port(int(row)).id for row in page]
+        if cursor is None:
+            return ids
+
+def test_pages_cover_every_port_once(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.publish(*catalog_data(250))
+    index = CatalogIndex(store.current())
+    
+    assert read_pages(index, 40) == [f"port_{i:04d}" for i in range(250)]
+    assert read_pages(index, 7, region='Europe') == [f"port_{i:04d}" for i in range(1, 250, 2)]
+
+def test_cursor_from_a_previous_version_is_rejected(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    store.publish(*catalog_data(250))
+    first = CatalogIndex(store.current())
+    page, cursor = first.page(first.query_ports(), None, 40)
+    
+    # Rows shift when the catalog changes, so an old cursor must not be reused
+    store.publish(*catalog_data(260))
+    second = CatalogIndex(store.current())
+    assert second.version != first.version
+    with pytest.raises(ValueError, match="restart pagination"):
+        second.page(second.query_ports(), cursor, 40)
+    
+    # A reader still holding the old version keeps paging it consistently
+    next_page, _ = first.page(first.query_ports(), cursor, 40)
+    assert int(next_page[0]) == int(page[-1]) + 1
+
+def test_mock_catalog_is_filtered_and_paged_like_a_snapshot(tmp_path):
+    fallback = DataProcessor()
+    attached = DataProcessor(SnapshotStore(str(tmp_path)))
+    attached.publish_reference_snapshot()
+    
+    for processor in (fallback, attached):
+        ids, cursor = [], None
+        while True:
+            ports, cursor, total = asyncio.run(processor.query_ports(cursor=cursor, limit=2))
+            ids += [port.id for port in ports]
+            if cursor is None:
+                break
+        assert ids == [port.id for port in processor.mock_ports] and total == len(ids)
+        
+        ports, _, _ = asyncio.run(processor.query_ports(reliability='high'))
+        assert [port.reliability_score for port in ports] == [0.8]
+        vessels, _, total = asyncio.run(processor.query_vessels(min_tonnage=1100, limit=1))
+        assert len(vessels) == 1 and vessels[0].tonnage >= 1100
+        assert total == sum(vessel['tonnage'] >= 1100 for vessel in processor.mock_vessels)
+
+@pytest.mark.parametrize("snapshot", [False, True])
+def test_unknown_reliability_band_is_rejected(tmp_path, snapshot):
+    processor = DataProcessor(SnapshotStore(str(tmp_path)) if snapshot else None)
+    processor.publish_reference_snapshot()
+    
+    with pytest.raises(ValueError, match="reliability must be one of"):
+        asyncio.run(processor.query_ports(reliability='excellent'))
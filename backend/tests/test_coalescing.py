@@ -0,0 +1,24 @@
+import asyncio
+import gc
+from services.coalescing import SingleFlight
+
+def test_in_flight_computation_survives_garbage_collection():
+    async def scenario():
+        single_flight = SingleFlight()
+        release = asyncio.Event()
+        
+        async def compute():
+            await release.wait()
+            return 42
+        
+        waiters = [asyncio.ensure_future(single_flight.run("key", compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gc.collect()
+        release.set()
+        return await asyncio.wait_for(asyncio.gather(*waiters), 1), single_flight
+    
+    results, single_flight = asyncio.run(scenario())
+    assert results == [42, 42, 42]
+    assert single_flight.executions == 1
+    assert single_flight.coalesced == 2
+    assert not single_flight._tasks
@@ -0,0 +1,49 @@
+from datetime import date
+import pytest
+from models.maritime import Vessel, GangSchedule
+from services.calculations import MaritimeCalculator
+from services.gang_optimizer import GangScheduleOptimizer
+
+VESSEL = Vessel(
+    id="vessel_1", name="Vessel", tonnage=20520, discharge=5, bcmea_rate=3.27, dock_cost=0.25,
+    bcmea_assurance=0.15, under_holding=0.08, grand_total=3.75
+)
+SCHEDULES = [
+    GangSchedule(day_type=day_type, shift_time="08:00", number_of_gangs=6, cost_per_gang=1000, total_cost=0)
+    for day_type in ("weekday", "weekend")
+]
+
+def test_plan_too_large_to_solve_is_rejected():
+    optimizer = GangScheduleOptimizer(MaritimeCalculator())
+    optimizer.tons_per_gang_shift = 0.0001
+    slots = optimizer.build_slots(SCHEDULES, date(2024, 1, 1), 21)
+    
+    with pytest.raises(ValueError):
+        optimizer.plan_berth_lineup([VESSEL], slots)
+
+def test_plan_within_bounds_is_solved():
+    optimizer = GangScheduleOptimizer(MaritimeCalculator())
+    slots = optimizer.build_slots(SCHEDULES, date(2024, 1, 1), 21)
+    
+    plan = optimizer.plan_berth_lineup([VESSEL], slots)[0]
+    assert plan.feasible
+    assert plan.gang_shifts_required == 42
+
+def test_waiting_through_a_weekend_costs_holding():
+    optimizer = GangScheduleOptimizer(MaritimeCalculator())
+    weekday_only = [
+        GangSchedule(day_type="weekday", shift_time="08:00", number_of_gangs=2, cost_per_gang=1000, total_cost=0)
+    ]
+    vessel = VESSEL.model_copy(update={'tonnage': 5000})
+    
+    # Ten gang-shifts at two a day take Monday to Friday from a Monday,
+    # but Thursday to Wednesday, across a weekend, from a Thursday
+    monday = optimizer.plan_berth_lineup([vessel], optimizer.build_slots(weekday_only, date(2024, 1, 1), 14))[0]
+    thursday = optimizer.plan_berth_lineup([vessel], optimizer.build_slots(weekday_only, date(2024, 1, 4), 14))[0]
+    holding_per_day = vessel.under_holding * vessel.tonnage
+    
+    assert monday.completion_day == 4 and thursday.completion_day == 6
+    assert monday.labour_cost == thursday.labour_cost
+    assert monday.holding_cost == round(5 * holding_per_day, 2)
+    assert thursday.holding_cost == round(7 * holding_per_day, 2)
+    assert thursday.total_cost > monday.total_cost
@@ -0,0 +1,56 @@
+import asyncio
+import json
+from services.ingest import ShipmentLog, ShipmentIngestor
+
+def record(i, **overrides):
+    values = {
+        "date": "2024-01-15", "port_id": f"port_{i % 3}", "route_id": f"route_{i % 5}",
+        "total_cost": 1000 + i, "tonnage": 500, "margin": 100
+    }
+    values.update(overrides)
+    return json.dumps(values).encode() + b"\n"
+
+def ingest(tmp_path, lines, batch_bytes=1024 * 1024):
+    log = ShipmentLog(str(tmp_path / "shipments.csv"))
+    ingestor = ShipmentIngestor(log)
+    ingestor.batch_bytes = batch_bytes
+    
+    async def stream():
+        for line in lines:
+            yield line
+    
+    return log, asyncio.run(ingestor.ingest_stream(stream(), "application/x-ndjson"))
+
+def test_acknowledged_ranges_hold_the_committed_records(tmp_path):
+    log, result = ingest(tmp_path, [record(i) for i in range(500)], batch_bytes=4096)
+    
+    assert result["accepted"] == 500
+    assert result["commits"] > 1
+    offset = 0
+    for start, end in result["ranges"]:
+        assert start == offset
+        offset = end
+    assert result["durable_offset"] == log.size()
+    
+    columns, resume = log.read_from(0)
+    assert resume == result["durable_offset"]
+    assert columns["total_cost"].tolist() == [1000.0 + i for i in range(500)]
+
+def test_errors_name_physical_lines_and_bad_lines_only_reject_themselves(tmp_path):
+    lines = [record(0), b"\n", record(1, tonnage=-1), b"{not json\n", record(2), b"   \n", record(3, date="soon")]
+    _, result = ingest(tmp_path, lines)
+    
+    assert result["accepted"] == 2
+    assert result["rejected"] == 3
+    assert [error["line"] for error in result["errors"]] == [3, 4, 7]
+
+def test_schema_error_after_a_commit_reports_the_committed_ranges(tmp_path):
+    committed = [record(i) for i in range(200)]
+    broken = [json.dumps({"date": "2024-01-15", "port_id": "port_1"}).encode() + b"\n"] * 200
+    log, result = ingest(tmp_path, committed + broken, batch_bytes=4096)
+    
+    assert "Missing required fields" in result["detail"]
+    assert result["accepted"] > 0
+    assert result["ranges"] and result["durable_offset"] == log.size()
+    columns, _ = log.read_from(0)
+    assert len(columns["total_cost"]) == result["accepted"]
@@ -0,0 +1,70 @@
+import asyncio
+import json
+from services.data_processor import DataProcessor
+from services.kpi_stream import KPIBroadcaster, diff_payload
+
+def point(date, cost):
+    return {"date": date, "expected": cost * 1.1, "realized": cost}
+
+def read_events(subscriber):
+    events = []
+    while not subscriber.queue.empty():
+        lines = subscriber.queue.get_nowait().splitlines()
+        events.append((lines[0][len("event: "):], json.loads(lines[2][len("data: "):])))
+    return events
+
+def test_trendline_is_reproduced_by_every_recompute():
+    processor = DataProcessor()
+    history = [{"date": "2024-01-01", "total_cost": 1000.0}, {"date": "2024-04-01", "total_cost": 2000.0}]
+    
+    first = processor.generate_trendline_data(history)
+    assert processor.generate_trendline_data(history) == first
+    assert first[0].realized != first[1].realized / 2
+
+def test_delta_sends_only_changed_and_appended_points():
+    old = {"margin": 1.0, "ports": ["a"], "trendline_data": [point("2024-01-01", 10), point("2024-04-01", 20)]}
+    new = {"margin": 1.0, "ports": ["b"], "trendline_data": [
+        point("2024-01-01", 10), point("2024-04-01", 25), point("2024-07-01", 30)
+    ]}
+    
+    assert diff_payload(old, new) == {
+        "ports": {"set": ["b"]},
+        "trendline_data": {"update": {1: point("2024-04-01", 25)}, "append": [point("2024-07-01", 30)]}
+    }
+    assert diff_payload(new, {"margin": 2.0}) == {
+        "margin": {"set": 2.0}, "ports": {"remove": True}, "trendline_data": {"remove": True}
+    }
+
+def test_slow_subscriber_is_resynced_with_one_snapshot():
+    async def scenario():
+        state = {"version": 0, "points": [point("2024-01-01", 10)]}
+        
+        async def compute():
+            return {"trendline_data": list(state["points"])}
+        
+        broadcaster = KPIBroadcaster(compute, lambda: state["version"], poll_interval=60, max_pending=3)
+        fast = await broadcaster.subscribe()
+        slow = await broadcaster.subscribe()
+        assert [event for event, _ in read_events(fast)] == ["snapshot"]
+        
+        for i in range(1, 6):
+            state["version"] = i
+            state["points"].append(point(f"2024-0{i + 1}-01", 10 + i))
+            await broadcaster.refresh()
+            if i <= 2:
+                # A subscriber that keeps up gets every change as a delta
+                assert read_events(fast) == [("delta", {"trendline_data": {"append": [state["points"][-1]]}})]
+        
+        # The slow subscriber's backlog hit the bound on the third change and
+        # was replaced by the snapshot of that change, then the later deltas
+        assert read_events(slow) == [
+            ("snapshot", {"trendline_data": state["points"][:4]}),
+            ("delta", {"trendline_data": {"append": [state["points"][4]]}}),
+            ("delta", {"trendline_data": {"append": [state["points"][5]]}})
+        ]
+        assert slow.resyncs == 1
+        assert slow.dropped_events == 3
+        assert fast.resyncs == 0
+        await broadcaster.stop()
+    
+    asyncio.run(scenario())
@@ -0,0 +1,36 @@
+import numpy as np
+from services.portfolio_risk import PortfolioRiskEngine
+
+def synthetic_history(port_ids, port_regions, months, loading, seed=0):
+    rng = np.random.default_rng(seed)
+    regions, region_index = np.unique(port_regions, return_inverse=True)
+    columns = {'date': [], 'port_id': [], 'disruption_probability': []}
+    for month in range(months):
+        region_factor = rng.standard_normal(len(regions))[region_index]
+        latent = loading * region_factor + np.sqrt(1 - loading ** 2) * rng.standard_normal(len(port_ids))
+        columns['date'] += [f"{2020 + month // 12}-{month % 12 + 1:02d}-01"] * len(port_ids)
+        columns['port_id'] += list(port_ids)
+        columns['disruption_probability'] += list(0.2 + 0.05 * latent)
+    return {name: np.array(values) for name, values in columns.items()}
+
+def test_factor_dimension_is_the_number_of_regions():
+    port_ids = np.array([f"port_{i:04d}" for i in range(600)])
+    port_regions = np.array([f"region_{i % 5}" for i in range(600)], dtype=object)
+    history = synthetic_history(port_ids, port_regions, months=120, loading=0.8)
+    
+    factors = PortfolioRiskEngine().estimate_factor_structure(port_ids, port_regions, history)
+    
+    assert factors['region_correlation'].shape == (5, 5)
+    assert np.allclose(factors['region_loadings'], 0.8, atol=0.05)
+    assert factors['estimated_region_pairs'] == 10
+
+def test_defaults_reproduce_port_pair_correlations():
+    engine = PortfolioRiskEngine()
+    port_ids = np.array(["port_1", "port_2"])
+    port_regions = np.array(["north", "south"], dtype=object)
+    
+    factors = engine.estimate_factor_structure(port_ids, port_regions, {})
+    loadings = factors['region_loadings']
+    
+    assert np.isclose(loadings[0] ** 2, engine.same_region_correlation)
+    assert np.isclose(loadings[0] * loadings[1] * factors['region_correlation'][0, 1], engine.cross_region_correlation)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from services.calculations import MaritimeCalculator
+from services.risk_analyzer import RiskAnalyzer
+from services.rollup import RollupCube
+
+def random_records(count, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2023-01-01", "2024-12-31", freq="D")
+    return [
+        {
+            'date': dates[rng.integers(len(dates))].strftime('%Y-%m-%d'),
+            'port_id': f"port_{rng.integers(6)}",
+            'route_id': f"route_{rng.integers(10)}",
+            'total_cost': float(rng.uniform(100000, 300000)),
+            'tonnage': float(rng.uniform(500, 2000)),
+            'margin': float(rng.uniform(5000, 20000)),
+            'disruption_probability': float(rng.uniform(0, 0.4)),
+            'risk_score': float(rng.uniform(0, 1)),
+            'realized_risk_cost': float(rng.uniform(0, 10000))
+        }
+        for _ in range(count)
+    ]
+
+@pytest.mark.parametrize("slice_filters", [
+    {},
+    {'port_id': 'port_2'},
+    {'period': '2024Q2'},
+    {'period': '2023Q4', 'route_id': 'route_3'}
+])
+def test_rollup_kpis_match_raw_rows(slice_filters):
+    calculator = MaritimeCalculator()
+    analyzer = RiskAnalyzer()
+    records = random_records(3000)
+    
+    # Folding in two batches must give the same cells as one
+    cube = RollupCube()
+    cube.add_records(records[:1000])
+    cube.add_records(records[1000:])
+    
+    rows = [
+        record for record in records
+        if all(
+            str(pd.Period(record['date'], 'Q')) == value if name == 'period' else record[name] == value
+            for name, value in slice_filters.items()
+        )
+    ]
+    assert rows
+    totals = cube.aggregate('quarterly', **slice_filters)
+    port_totals = cube.group_by('quarterly', 'port_id', **slice_filters)
+    
+    assert totals.count('total_cost') == len(rows)
+    assert calculator.calculate_total_expected_margin_from_rollup(totals) == calculator.calculate_total_expected_margin(rows)
+    assert calculator.calculate_cost_of_uncertainty_from_rollup(totals) == pytest.approx(
+        calculator.calculate_cost_of_uncertainty(rows), abs=0.01
+    )
+    assert analyzer.calculate_avg_disruption_probability_from_rollup(totals) == analyzer.calculate_avg_disruption_probability(rows)
+    assert [port.id for port in analyzer.get_top_risk_ports_from_rollup(port_totals)] == [
+        port.id for port in analyzer.get_top_risk_ports(rows)
+    ]
+
+@pytest.mark.parametrize("grain", ["monthly", "quarterly", "yearly"])
+def test_kpi_trendline_is_dated_by_iso_period_start(grain):
+    from services.dashboard import DashboardPipeline
+    from services.data_processor import DataProcessor
+    
+    cube = RollupCube()
+    cube.add_records(random_records(500))
+    pipeline = DashboardPipeline(MaritimeCalculator(), RiskAnalyzer(), DataProcessor())
+    
+    dates = [point['date'] for point in pipeline.compute_kpis(cube, RiskAnalyzer(), grain)['trendline_data']]
+    assert dates == sorted(dates)
+    assert all(pd.Timestamp(date).strftime('%Y-%m-%d') == date for date in dates)
+    assert dates[0] == '2023-01-01'
+    assert len(dates) == {'monthly': 24, 'quarterly': 8, 'yearly': 2}[grain]
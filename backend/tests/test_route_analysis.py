@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+from models.maritime import Port, Route, PortUpdate
+from services.calculations import MaritimeCalculator
+from services.risk_analyzer import RiskAnalyzer
+from services.route_table import RouteAnalysisTable
+
+REGIONS = ['Asia', 'Africa', 'South America', 'Europe', 'North America', 'Antarctica']
+
+def random_routes(count, seed=7):
+    rng = np.random.default_rng(seed)
+    routes = []
+    for i in range(count):
+        ports = [
+            Port(
+                id=f"port_{rng.integers(50)}",
+                name="Port",
+                country="Country",
+                region=str(rng.choice(REGIONS)),
+                coordinates={"lat": 0.0, "lng": 0.0},
+                corruption_index=None if rng.random() < 0.1 else float(rng.random()),
+                reliability_score=None if rng.random() < 0.1 else float(rng.random())
+            )
+            for _ in range(2)
+        ]
+        routes.append(Route(
+            id=f"route_{i}", name=f"Route {i}", origin_port=ports[0], destination_port=ports[1],
+            distance=float(rng.uniform(100, 20000)), estimated_days=float(rng.uniform(1, 60)),
+            base_cost=0, risk_cost=0, p95_cost=0, expected_margin=float(rng.uniform(0, 1000)),
+            disruption_probability=float(rng.random()), recommendation='use', savings=0
+        ))
+    return routes
+
+def test_single_route_analysis_matches_batch_analysis():
+    table = RouteAnalysisTable(MaritimeCalculator(), RiskAnalyzer())
+    routes = random_routes(500)
+    
+    assert [table.analyze_route(route) for route in routes] == table.analyze_routes(routes)
+
+def test_kernel_matches_scalar_formulas():
+    calculator, risk_analyzer = MaritimeCalculator(), RiskAnalyzer()
+    table = RouteAnalysisTable(calculator, risk_analyzer)
+    routes = random_routes(5000)
+    
+    for route, row in zip(routes, table.analyze_routes(routes)):
+        base_cost = calculator.calculate_base_cost(route)
+        risk_cost = risk_analyzer.calculate_risk_cost(route)
+        p95_cost = calculator.calculate_p95_cost(route, risk_cost)
+        savings = calculator.calculate_potential_savings(route, base_cost, p95_cost)
+        
+        # Both share the formulas and round only their outputs, so they agree
+        assert row['base_cost'] == base_cost
+        assert row['risk_cost'] == risk_cost
+        assert row['p95_cost'] == p95_cost
+        assert row['savings'] == savings
+        assert row['recommendation'] == risk_analyzer.get_route_recommendation(route, row['risk_cost'])
+
+def test_port_update_recomputes_dependent_rows_with_kernel():
+    table = RouteAnalysisTable(MaritimeCalculator(), RiskAnalyzer())
+    routes = random_routes(200)
+    table.upsert_routes(routes)
+    port_id = routes[0].destination_port.id
+    
+    change_set = table.update_port(port_id, PortUpdate(corruption_index=0.95))
+    
+    dependent = sorted(table.port_routes[port_id])
+    assert {change['id'] for change in change_set['updated']} <= set(dependent)
+    assert table.get_rows(dependent) == table.analyze_routes([table.routes[route_id] for route_id in dependent])
+
+def test_invalid_port_update_is_rejected_and_leaves_table_untouched():
+    table = RouteAnalysisTable(MaritimeCalculator(), RiskAnalyzer())
+    routes = random_routes(50)
+    table.upsert_routes(routes)
+    port_id = routes[0].destination_port.id
+    before = dict(table.routes)
+    
+    with pytest.raises(ValueError):
+        table.update_port(port_id, PortUpdate(name=None))
+    with pytest.raises(ValueError):
+        table.update_port(port_id, PortUpdate.model_construct(corruption_index="high"))
+    
+    assert table.routes == before
+    assert table.routes[routes[0].id].destination_port.name == "Port"
+
+def test_workers_share_edits_through_the_table_file(tmp_path):
+    path = str(tmp_path / "route-table.json")
+    workers = [RouteAnalysisTable(MaritimeCalculator(), RiskAnalyzer(), path) for _ in range(2)]
+    routes = random_routes(20)
+    
+    workers[0].upsert_routes(routes[:10])
+    # An edit in another worker applies on top of the latest shared version
+    change_set = workers[1].upsert_routes(routes[10:])
+    assert change_set["version"] == 2
+    assert len(change_set["added"]) == 10
+    
+    port_id = routes[0].destination_port.id
+    workers[1].update_port(port_id, PortUpdate(corruption_index=0.95))
+    workers[0].remove_routes([routes[-1].id])
+    
+    expected = workers[1].get_rows()
+    assert workers[0].get_rows() == expected
+    assert workers[0].version == workers[1].version == 4
+    assert len(expected) == 19
+    assert workers[0].routes[routes[0].id].destination_port.corruption_index == 0.95
+
+def test_update_of_a_port_on_no_route_is_not_found():
+    table = RouteAnalysisTable(MaritimeCalculator(), RiskAnalyzer())
+    table.upsert_routes(random_routes(10))
+    
+    with pytest.raises(KeyError):
+        table.update_port("no_such_port", PortUpdate(corruption_index=0.5))
+    assert table.version == 1
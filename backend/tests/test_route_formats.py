@@ -0,0 +1,23 @@
+import io
+import pytest
+from fastapi.testclient import TestClient
+from tests.test_route_analysis import random_routes
+
+pyarrow_ipc = pytest.importorskip("pyarrow.ipc")
+
+import main
+
+def test_json_and_arrow_route_analyses_are_identical():
+    client = TestClient(main.app)
+    routes = [route.model_dump() for route in random_routes(20000, seed=11)]
+    body = {"routes": routes, "vessels": [], "gang_schedules": []}
+    
+    rows = client.post("/api/routes/analyze", json=body).json()["routes"]
+    response = client.post(
+        "/api/routes/analyze", json=body,
+        headers={"accept": "application/vnd.apache.arrow.stream"}
+    )
+    columns = pyarrow_ipc.open_stream(io.BytesIO(response.content)).read_all().to_pydict()
+    
+    for field in ["id", "base_cost", "risk_cost", "p95_cost", "savings", "recommendation"]:
+        assert columns[field] == [row[field] for row in rows], field
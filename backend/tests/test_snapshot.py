@@ -0,0 +1,108 @@
+import asyncio
+import numpy as np
+from services.data_processor import DataProcessor
+from services import snapshot
+from services.snapshot import SnapshotStore
+from services.ingest import ShipmentLog
+
+def reference_data():
+    processor = DataProcessor()
+    return processor.mock_ports, processor.mock_vessels, processor.mock_history
+
+def test_publish_if_changed_reuses_snapshot_of_same_data(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    ports, vessels, history = reference_data()
+    
+    assert store.publish_if_changed(ports, vessels, history) == 1
+    assert store.publish_if_changed(ports, vessels, history) == 1
+    assert store.current().version == 1
+
+def test_publish_if_changed_replaces_snapshot_of_other_data(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    ports, vessels, history = reference_data()
+    store.publish_if_changed(ports, vessels, history)
+    attached = store.current()
+    
+    changed_history = history + [dict(history[0], total_cost=1.0)]
+    assert store.publish_if_changed(ports, vessels, changed_history) == 2
+    
+    # Attached readers swap to the new version on their next read
+    current = store.current()
+    assert current is not attached
+    assert current.version == 2
+    assert current.row_count('history') == len(changed_history)
+
+def test_publish_always_creates_a_new_version(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    ports, vessels, history = reference_data()
+    store.publish_if_changed(ports, vessels, history)
+    
+    assert store.publish(ports, vessels, history) == 2
+    assert store.current().version == 2
+
+def test_snapshot_of_older_schema_is_republished(tmp_path, monkeypatch):
+    store = SnapshotStore(str(tmp_path))
+    ports, vessels, history = reference_data()
+    
+    # A snapshot left behind by a build without the realized_risk_cost column
+    with monkeypatch.context() as patch:
+        patch.setattr(snapshot, 'SNAPSHOT_SCHEMA_VERSION', 1)
+        patch.setattr(snapshot, 'HISTORY_NUMERIC_COLUMNS', [
+            name for name in snapshot.HISTORY_NUMERIC_COLUMNS if name != 'realized_risk_cost'
+        ])
+        store.publish_if_changed(ports, vessels, history)
+    
+    # It is never attached, even though it holds the same source data
+    assert store.current() is None
+    
+    processor = DataProcessor(store)
+    assert processor.publish_reference_snapshot() == 2
+    current = store.current()
+    assert current.version == 2
+    assert current.schema_version == snapshot.SNAPSHOT_SCHEMA_VERSION
+    records = current.history_records()
+    assert [record['realized_risk_cost'] for record in records] == [
+        record['realized_risk_cost'] for record in history
+    ]
+
+def test_ingested_shipments_are_folded_into_one_shared_version(tmp_path):
+    store = SnapshotStore(str(tmp_path))
+    log = ShipmentLog(str(tmp_path / "shipments.csv"))
+    workers = [DataProcessor(store, log), DataProcessor(SnapshotStore(str(tmp_path)), log)]
+    workers[0].publish_reference_snapshot()
+    reference_rows = len(workers[0].mock_history)
+    
+    log.append(b"2024-02-01,port_1,route_1,1500.0,400.0,90.0,,,\n2024-02-02,port_2,route_2,1600.0,,80.0,,,\n")
+    cube = asyncio.run(workers[0].get_rollup_cube())
+    
+    # The first worker to read publishes the fold; the other attaches to it
+    for worker in workers:
+        history = asyncio.run(worker.get_history_columns())
+        assert worker.get_snapshot().version == 2
+        assert len(history['date']) == reference_rows + 2
+        assert history['port_id'][-1] == 'port_2'
+        assert np.isnan(history['tonnage'][-1])
+    assert asyncio.run(workers[0].get_rollup_cube()) is cube
+    
+    log.append(b"2024-02-03,port_3,route_3,1700.0,300.0,70.0,,,\n")
+    assert asyncio.run(workers[1].get_rollup_cube()).aggregate('yearly').count('total_cost') == reference_rows + 3
+    assert workers[0].get_snapshot().version == 3
+    
+    # A forced republish starts from the reference data and refolds the log
+    workers[0].publish_reference_snapshot(force=True)
+    assert len(asyncio.run(workers[1].get_history_columns())['date']) == reference_rows + 3
+    assert store.current().version == 5
+
+def test_history_is_read_without_decoding_or_rebuilding_records(tmp_path):
+    processor = DataProcessor(SnapshotStore(str(tmp_path)))
+    processor.publish_reference_snapshot()
+    
+    history = asyncio.run(processor.get_history_columns())
+    assert history['port_id'].dtype.kind == 'U'
+    assert not history['port_id'].flags.owndata
+    assert history['port_id'].tolist() == [record['port_id'] for record in processor.mock_history]
+    
+    records = asyncio.run(processor.get_historical_data())
+    assert asyncio.run(processor.get_historical_data()) is records
+    processor.publish_reference_snapshot(force=True)
+    assert asyncio.run(processor.get_historical_data()) is not records